@@ -0,0 +1,199 @@
+"""
+InvestTracker - Motor de evaluación de alertas
+==============================================
+
+Mantiene en memoria las alertas activas indexadas por ticker para que el scheduler
+pueda resolver, en cuanto llega el precio de ese ticker, exactamente qué alertas se
+disparan, sin consultar la base de datos por cada activo ni recorrer cada alerta.
+
+Las alertas se cargan con su activo embebido (como en database.get_active_alerts):
+    {"id": ..., "alert_type": ..., "target_value": ..., "is_percentage": ...,
+     "assets": {"ticker": ..., "avg_purchase_price": ...}}
+"""
+
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+
+# Alertas que se disparan cuando el precio baja hasta el umbral o por debajo
+TRIGGER_BELOW = ("target_buy", "stop_loss")
+# Alertas que se disparan cuando el precio sube hasta el umbral o por encima
+TRIGGER_ABOVE = ("target_sell", "take_profit")
+
+
+def alert_threshold(alert: Dict, avg_purchase_price: float) -> float:
+    """Umbral absoluto de una alerta (las porcentuales se calculan sobre el precio promedio)"""
+    if alert['is_percentage']:
+        return float(avg_purchase_price) * (1 + float(alert['target_value']) / 100)
+    return float(alert['target_value'])
+
+
+def alert_message(alert_type: str, price: float) -> str:
+    """Mensaje de la notificación para una alerta disparada"""
+    messages = {
+        'target_buy': f"El precio ha alcanzado tu objetivo de compra: ${price:.2f}",
+        'target_sell': f"El precio ha alcanzado tu objetivo de venta: ${price:.2f}",
+        'stop_loss': f"¡STOP LOSS activado! Precio actual: ${price:.2f}",
+        'take_profit': f"¡TAKE PROFIT alcanzado! Precio actual: ${price:.2f}",
+    }
+    return messages[alert_type]
+
+
+class AlertIndex:
+    """Índice por ticker de umbrales absolutos ordenados.
+
+    Cada ticker tiene dos arrays ordenados: las alertas que se disparan con el precio
+    en o por debajo del umbral y las que se disparan en o por encima. Un precio nuevo
+    se resuelve con dos búsquedas bisect, devolviendo exactamente las alertas que se
+    disparan sin recorrer el resto.
+    """
+
+    def __init__(self):
+        # ticker_key -> {"below": ([umbrales], [ids]), "above": ([umbrales], [ids])}
+        self._by_ticker: Dict[Hashable, Dict[str, Tuple[List[float], List[str]]]] = {}
+        # alert_id -> (ticker_key, lado, umbral, alerta)
+        self._alerts: Dict[str, Tuple[Hashable, str, float, Dict]] = {}
+        self._by_asset: Dict[str, set] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self._alerts)
+
+    def __contains__(self, alert_id: str) -> bool:
+        return alert_id in self._alerts
+
+    @staticmethod
+    def _side(alert: Dict) -> Optional[str]:
+        if alert['alert_type'] in TRIGGER_BELOW:
+            return "below"
+        if alert['alert_type'] in TRIGGER_ABOVE:
+            return "above"
+        return None
+
+    def _forget(self, alert_id: str) -> Optional[Tuple[Hashable, str, float, Dict]]:
+        """Saca la alerta de los diccionarios (no de los arrays ordenados)"""
+        entry = self._alerts.pop(alert_id, None)
+        if entry is None:
+            return None
+        asset_id = entry[3]['asset_id']
+        asset_alerts = self._by_asset.get(asset_id)
+        if asset_alerts is not None:
+            asset_alerts.discard(alert_id)
+            if not asset_alerts:
+                del self._by_asset[asset_id]
+        return entry
+
+    def _drop_if_empty(self, ticker_key: Hashable):
+        sides = self._by_ticker.get(ticker_key)
+        if sides is not None and not sides["below"][0] and not sides["above"][0]:
+            del self._by_ticker[ticker_key]
+
+    def add(self, ticker_key: Hashable, alert: Dict, avg_purchase_price: Optional[float] = None):
+        """Agrega o reemplaza una alerta, convirtiendo su umbral a valor absoluto una sola vez.
+
+        Si no se indica el precio promedio se toma del activo embebido en la alerta.
+        """
+        side = self._side(alert)
+        if side is None:
+            return
+        if avg_purchase_price is None:
+            avg_purchase_price = (alert.get('assets') or {}).get('avg_purchase_price', 0)
+        self.remove(alert['id'])
+        threshold = alert_threshold(alert, avg_purchase_price)
+        thresholds, ids = self._by_ticker.setdefault(
+            ticker_key, {"below": ([], []), "above": ([], [])}
+        )[side]
+        pos = bisect_right(thresholds, threshold)
+        thresholds.insert(pos, threshold)
+        ids.insert(pos, alert['id'])
+        self._alerts[alert['id']] = (ticker_key, side, threshold, alert)
+        self._by_asset[alert['asset_id']].add(alert['id'])
+
+    def add_many(self, alerts: Iterable[Tuple[Hashable, Dict]], avg_purchase_price: Optional[float] = None):
+        """Agrega o reemplaza muchas alertas: agrupa por ticker y lado y ordena cada array una vez.
+
+        avg_purchase_price, si se indica, vale para todas (p.ej. las de un mismo activo).
+        """
+        entries = {}
+        for ticker_key, alert in alerts:
+            side = self._side(alert)
+            if side is None:
+                continue
+            avg = avg_purchase_price
+            if avg is None:
+                avg = (alert.get('assets') or {}).get('avg_purchase_price', 0)
+            entries[alert['id']] = (ticker_key, side, alert_threshold(alert, avg), alert)
+        self.remove_many([alert_id for alert_id in entries if alert_id in self._alerts])
+
+        grouped = defaultdict(list)
+        for alert_id, (ticker_key, side, threshold, alert) in entries.items():
+            grouped[(ticker_key, side)].append((threshold, alert_id))
+            self._alerts[alert_id] = (ticker_key, side, threshold, alert)
+            self._by_asset[alert['asset_id']].add(alert_id)
+        for (ticker_key, side), added in grouped.items():
+            sides = self._by_ticker.setdefault(ticker_key, {"below": ([], []), "above": ([], [])})
+            thresholds, ids = sides[side]
+            merged = sorted([*zip(thresholds, ids), *added], key=lambda item: item[0])
+            sides[side] = ([t for t, _ in merged], [i for _, i in merged])
+
+    def remove(self, alert_id: str) -> Optional[Dict]:
+        """Quita una alerta del índice (borrada, desactivada o disparada)"""
+        entry = self._forget(alert_id)
+        if entry is None:
+            return None
+        ticker_key, side, threshold, alert = entry
+        thresholds, ids = self._by_ticker[ticker_key][side]
+        lo = bisect_left(thresholds, threshold)
+        hi = bisect_right(thresholds, threshold)
+        pos = ids.index(alert_id, lo, hi)
+        del thresholds[pos]
+        del ids[pos]
+        self._drop_if_empty(ticker_key)
+        return alert
+
+    def remove_many(self, alert_ids: Iterable[str]) -> List[Dict]:
+        """Quita muchas alertas reconstruyendo una sola vez los arrays de cada ticker y lado"""
+        gone = defaultdict(set)
+        removed = []
+        for alert_id in alert_ids:
+            entry = self._forget(alert_id)
+            if entry is None:
+                continue
+            ticker_key, side, _, alert = entry
+            gone[(ticker_key, side)].add(alert_id)
+            removed.append(alert)
+        for (ticker_key, side), ids_gone in gone.items():
+            sides = self._by_ticker[ticker_key]
+            thresholds, ids = sides[side]
+            kept = [(t, i) for t, i in zip(thresholds, ids) if i not in ids_gone]
+            sides[side] = ([t for t, _ in kept], [i for _, i in kept])
+            self._drop_if_empty(ticker_key)
+        return removed
+
+    def remove_asset(self, asset_id: str):
+        """Quita todas las alertas de un activo"""
+        self.remove_many(list(self._by_asset.get(asset_id, ())))
+
+    def reprice_asset(self, asset_id: str, ticker_key: Hashable, avg_purchase_price: float):
+        """Recalcula umbrales (y ticker) de las alertas de un activo que cambió"""
+        alerts = [self._alerts[alert_id][3] for alert_id in self._by_asset.get(asset_id, ())]
+        self.add_many(((ticker_key, alert) for alert in alerts), avg_purchase_price)
+
+    def triggered(self, ticker_key: Hashable, price: float) -> List[Dict]:
+        """Alertas del ticker que se disparan con este precio"""
+        sides = self._by_ticker.get(ticker_key)
+        if not sides:
+            return []
+        below_thresholds, below_ids = sides["below"]
+        above_thresholds, above_ids = sides["above"]
+        # "en o por debajo": umbral >= precio / "en o por encima": umbral <= precio
+        fired = below_ids[bisect_left(below_thresholds, price):]
+        fired += above_ids[:bisect_right(above_thresholds, price)]
+        return [self._alerts[alert_id][3] for alert_id in fired]
+
+    def evaluate(self, ticker_key: Hashable, price: float) -> List[Tuple[Dict, str]]:
+        """Devuelve (alerta, mensaje) para cada alerta del ticker que se dispara con este precio"""
+        return [
+            (alert, alert_message(alert['alert_type'], price))
+            for alert in self.triggered(ticker_key, price)
+        ]
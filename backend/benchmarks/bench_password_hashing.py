@@ -0,0 +1,88 @@
+"""
+Benchmark: bcrypt dentro del event loop vs. executor de hilos vs. executor de procesos
+=====================================================================================
+
+Simula una ráfaga de logins concurrentes (verify_password) y mide, para cada
+estrategia:
+    - latencia de cada login (p50 / p95 / max)
+    - lag del event loop: cuánto se atrasa una tarea que debería despertar cada 10 ms
+      (es lo que sufren todas las demás requests del worker durante la ráfaga)
+
+Uso (desde backend/):
+    python benchmarks/bench_password_hashing.py --logins 40 --workers 4
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from passwords import PasswordHasher, hash_password, verify_password  # noqa: E402
+
+
+TICK = 0.010
+
+
+async def measure_loop_lag(stop: asyncio.Event, lags: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - start - TICK)
+
+
+async def inline_verify(password: str, hashed: str) -> bool:
+    # Lo que hacía /api/auth/login antes: bcrypt directo en el handler async
+    return verify_password(password, hashed)
+
+
+async def run_burst(name: str, verify, logins: int, password: str, hashed: str):
+    lags = []
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(measure_loop_lag(stop, lags))
+    await asyncio.sleep(TICK * 2)
+
+    async def login():
+        start = time.perf_counter()
+        assert await verify(password, hashed)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(login() for _ in range(logins)))
+    wall = time.perf_counter() - start
+    stop.set()
+    await monitor
+
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(
+        f"{name:<10} wall={wall * 1000:8.1f}ms  "
+        f"login p50={statistics.median(latencies) * 1000:7.1f}ms p95={p95 * 1000:7.1f}ms "
+        f"max={latencies[-1] * 1000:7.1f}ms  "
+        f"loop lag max={max(lags or [0]) * 1000:7.1f}ms mean={statistics.fmean(lags or [0]) * 1000:6.2f}ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=40, help="logins concurrentes en la ráfaga")
+    parser.add_argument("--workers", type=int, default=4, help="tamaño del executor")
+    args = parser.parse_args()
+
+    password = "demo123"
+    hashed = hash_password(password)
+    print(f"{args.logins} concurrent logins, executor size {args.workers}\n")
+
+    await run_burst("inline", inline_verify, args.logins, password, hashed)
+    for mode in ("thread", "process"):
+        hasher = PasswordHasher(workers=args.workers, mode=mode)
+        await hasher.verify(password, hashed)  # calentar el pool
+        await run_burst(mode, hasher.verify, args.logins, password, hashed)
+        hasher.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
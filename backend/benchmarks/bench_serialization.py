@@ -0,0 +1,120 @@
+"""
+Benchmark: serialización de listados antes y después de RowSerializer
+=====================================================================
+
+Genera N filas sintéticas con la forma que devuelve PostgREST y mide filas/segundo
+de dos caminos para los listados de assets, alerts y notifications:
+
+    - antes: un modelo Pydantic por fila construido a mano, revalidación del
+      response_model, jsonable_encoder y json.dumps (lo que hacía FastAPI)
+    - después: RowSerializer (TypeAdapter en bloque + dump_json de pydantic-core)
+
+Uso (desde backend/):
+    python benchmarks/bench_serialization.py --rows 10000 --repeat 5
+"""
+
+import argparse
+import json
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+from server import (  # noqa: E402
+    Alert, Asset, Notification, alerts_json, assets_json, notifications_json,
+)
+
+
+def asset_row(i: int) -> dict:
+    return {
+        "id": str(uuid.uuid4()), "user_id": str(uuid.uuid4()), "asset_type": "CEDEAR",
+        "ticker": f"T{i % 500}", "quantity": 10 + i % 7, "avg_purchase_price": 100.5 + i % 13,
+        "purchase_date": "2024-01-15", "market": "NYSE", "created_at": "2024-01-15T12:00:00+00:00",
+        "updated_at": "2024-01-15T12:00:00+00:00",
+    }
+
+
+def alert_row(i: int) -> dict:
+    return {
+        "id": str(uuid.uuid4()), "user_id": str(uuid.uuid4()), "asset_id": str(uuid.uuid4()),
+        "alert_type": "stop_loss", "target_value": 10 + i % 5, "is_percentage": bool(i % 2),
+        "is_active": True, "created_at": "2024-01-15T12:00:00+00:00",
+    }
+
+
+def notification_row(i: int) -> dict:
+    return {
+        "id": str(uuid.uuid4()), "user_id": str(uuid.uuid4()), "title": f"Alerta: T{i % 500}",
+        "message": "El precio alcanzó el objetivo", "notification_type": "alert",
+        "ticker": f"T{i % 500}", "current_price": 123.45, "is_read": False,
+        "created_at": "2024-01-15T12:00:00+00:00",
+    }
+
+
+# Construcción por fila que hacían los endpoints antes de RowSerializer
+def legacy_asset(a: dict) -> Asset:
+    return Asset(asset_id=a['id'], user_id=a['user_id'], asset_type=a['asset_type'],
+                 ticker=a['ticker'], quantity=a['quantity'], avg_purchase_price=a['avg_purchase_price'],
+                 purchase_date=a['purchase_date'], market=a['market'], created_at=a.get('created_at', ''))
+
+
+def legacy_alert(a: dict) -> Alert:
+    return Alert(alert_id=a['id'], user_id=a['user_id'], asset_id=a['asset_id'],
+                 alert_type=a['alert_type'], target_value=a['target_value'],
+                 is_percentage=a['is_percentage'], is_active=a['is_active'], created_at=a.get('created_at', ''))
+
+
+def legacy_notification(n: dict) -> Notification:
+    return Notification(notification_id=n['id'], user_id=n['user_id'], title=n['title'],
+                        message=n['message'], notification_type=n['notification_type'],
+                        ticker=n.get('ticker'), current_price=n.get('current_price'),
+                        is_read=n.get('is_read', False), created_at=n.get('created_at', ''))
+
+
+def legacy_response(model, build, rows: List[dict]) -> bytes:
+    models = [build(r) for r in rows]
+    # FastAPI revalida contra el response_model, lo pasa a dict y codifica con json
+    adapter = TypeAdapter(List[model])
+    content = jsonable_encoder(adapter.dump_python(adapter.validate_python(models), mode="json", by_alias=True))
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def measure(fn, rows: List[dict], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(rows)
+        best = min(best, time.perf_counter() - start)
+    return len(rows) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    cases = [
+        ("assets", asset_row, Asset, legacy_asset, assets_json),
+        ("alerts", alert_row, Alert, legacy_alert, alerts_json),
+        ("notifications", notification_row, Notification, legacy_notification, notifications_json),
+    ]
+    print(f"{args.rows} filas, mejor de {args.repeat} corridas (filas/segundo)\n")
+    print(f"{'listado':<15}{'antes':>14}{'después':>14}{'mejora':>10}")
+    for name, make_row, model, build, serializer in cases:
+        rows = [make_row(i) for i in range(args.rows)]
+        # Ambos caminos tienen que producir el mismo JSON
+        assert json.loads(legacy_response(model, build, rows)) == json.loads(serializer.dump_json(rows))
+        before = measure(lambda r: legacy_response(model, build, r), rows, args.repeat)
+        after = measure(serializer.dump_json, rows, args.repeat)
+        print(f"{name:<15}{before:>14,.0f}{after:>14,.0f}{after / before:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
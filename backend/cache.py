@@ -0,0 +1,129 @@
+"""
+InvestTracker - Cachés en memoria
+=================================
+
+Caché LRU acotada con expiración (TTL) por entrada y coalescencia "single-flight":
+si varias corrutinas piden a la vez la misma clave ausente, solo una ejecuta la
+carga y el resto espera su resultado.
+
+Uso:
+    from cache import TTLCache
+    prices = TTLCache(maxsize=5000, ttl=120)
+    price = await prices.get_or_load("AAPL", lambda: fetch("AAPL"))
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Caché LRU con TTL, contadores de uso y carga coalescida por clave"""
+
+    def __init__(self, maxsize: int, ttl: float, cache_none: bool = False):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.cache_none = cache_none
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self._lookup(key) is not _MISSING
+
+    def _lookup(self, key: Hashable) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return _MISSING
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return _MISSING
+        self._data.move_to_end(key)
+        return value
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Devuelve el valor vigente de la clave (o default), contando hit/miss"""
+        value = self._lookup(key)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Como get pero sin contar hit/miss (para actualizar valores ya cacheados)"""
+        value = self._lookup(key)
+        return default if value is _MISSING else value
+
+    def replace(self, key: Hashable, value: Any) -> bool:
+        """Reemplaza el valor de una clave vigente conservando su expiración"""
+        if self._lookup(key) is _MISSING:
+            return False
+        self._data[key] = (self._data[key][0], value)
+        return True
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Guarda un valor, desalojando las entradas menos usadas si se supera maxsize"""
+        if value is None and not self.cache_none:
+            return
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Devuelve el valor en caché o lo carga una sola vez aunque haya pedidos concurrentes"""
+        value = self._lookup(key)
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(self._load(key, loader))
+            self._inflight[key] = task
+        # shield: si un llamador se cancela (p.ej. por deadline) la carga compartida sigue
+        return await asyncio.shield(task)
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await loader()
+            self.set(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "inflight": len(self._inflight),
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
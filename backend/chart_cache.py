@@ -0,0 +1,122 @@
+"""
+InvestTracker - Caché persistente de series de Yahoo
+====================================================
+
+Guarda en disco (SQLite) las series de precios descargadas de Yahoo por símbolo e
+intervalo, para que sobrevivan reinicios y solo haya que pedir la cola faltante
+desde el último timestamp guardado.
+
+Las entradas se desalojan por antigüedad (sin uso durante max_age segundos) y por
+tamaño total (max_bytes, desalojando primero las menos usadas).
+
+Uso:
+    cache = ChartCache(Path("chart_cache.sqlite3"))
+    entry = cache.load("AAPL", "1d")
+    cache.store("AAPL", "1d", points, covered_from, current_price)
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+class ChartCache:
+    """Series (timestamp, cierre) por (símbolo, intervalo) persistidas en SQLite"""
+
+    def __init__(self, path: Path, max_bytes: int = 50 * 1024 * 1024, max_age: float = 30 * 86400):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS series (
+                symbol TEXT NOT NULL,
+                interval TEXT NOT NULL,
+                covered_from INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                current_price REAL,
+                points TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                PRIMARY KEY (symbol, interval)
+            )
+            """
+        )
+        self._conn.commit()
+
+    def load(self, symbol: str, interval: str) -> Optional[Dict]:
+        """Devuelve la serie guardada (y marca el acceso) o None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT covered_from, fetched_at, current_price, points FROM series "
+                "WHERE symbol = ? AND interval = ?",
+                (symbol, interval),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE series SET accessed_at = ? WHERE symbol = ? AND interval = ?",
+                (time.time(), symbol, interval),
+            )
+            self._conn.commit()
+        covered_from, fetched_at, current_price, points = row
+        return {
+            "covered_from": covered_from,
+            "fetched_at": fetched_at,
+            "current_price": current_price,
+            "points": [tuple(p) for p in json.loads(points)],
+        }
+
+    def store(self, symbol: str, interval: str, points: List[Tuple[int, float]], covered_from: int,
+              current_price: Optional[float]):
+        """Guarda (reemplaza) la serie y aplica el desalojo"""
+        payload = json.dumps(points, separators=(",", ":"))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO series "
+                "(symbol, interval, covered_from, fetched_at, accessed_at, current_price, points, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (symbol, interval, covered_from, now, now, current_price, payload, len(payload)),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        self._conn.execute("DELETE FROM series WHERE accessed_at < ?", (now - self.max_age,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM series").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for symbol, interval, size in self._conn.execute(
+            "SELECT symbol, interval, size FROM series ORDER BY accessed_at ASC"
+        ).fetchall():
+            self._conn.execute("DELETE FROM series WHERE symbol = ? AND interval = ?", (symbol, interval))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM series"
+            ).fetchone()
+        return {"entries": entries, "bytes": size, "max_bytes": self.max_bytes, "max_age": self.max_age}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def merge_points(cached: List[Tuple[int, float]], fresh: List[Tuple[int, float]],
+                 keep_since: int) -> List[Tuple[int, float]]:
+    """Une la serie guardada con la cola nueva; los puntos nuevos reemplazan a los viejos
+    desde su primer timestamp (la última vela cacheada pudo haber estado incompleta)."""
+    if fresh:
+        cutoff = fresh[0][0]
+        cached = [p for p in cached if p[0] < cutoff]
+    return [p for p in cached + fresh if p[0] >= keep_since]
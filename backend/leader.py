@@ -0,0 +1,246 @@
+"""
+InvestTracker - Elección de líder para el scheduler
+===================================================
+
+Con `uvicorn --workers N` o varios dynos cada proceso arranca su propio scheduler y
+check_prices_and_alerts correría N veces por intervalo. LeaderElection garantiza que
+solo un proceso tenga los jobs activos:
+
+    - FileLockElector: lock exclusivo sobre un archivo (un solo host). El sistema
+      operativo lo libera apenas muere el proceso, así el failover es inmediato.
+    - LeaseElector: lease con vencimiento en una fila compartida (varios hosts). El
+      líder la renueva cada pocos segundos; si muere, otro proceso la toma cuando
+      vence. El almacenamiento puede ser la tabla scheduler_leases de Supabase
+      (PostgrestLeaseStore) o un archivo SQLite local que la emula (SqliteLeaseStore).
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+import httpx
+
+from pagination import quote_value
+
+
+def default_holder_id() -> str:
+    """Identificador único de este proceso (host, pid y un sufijo aleatorio)"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class FileLockElector:
+    """Líder = el proceso que tiene el lock exclusivo del archivo"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._fd: Optional[int] = None
+
+    async def try_acquire(self) -> bool:
+        if self._fd is not None:
+            return True
+        fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.name == "nt":
+                import msvcrt
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    async def release(self):
+        if self._fd is None:
+            return
+        try:
+            if os.name == "nt":
+                import msvcrt
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+
+class SqliteLeaseStore:
+    """Emula la tabla de leases en un archivo SQLite compartido por los procesos locales"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS scheduler_leases "
+                "(name TEXT PRIMARY KEY, holder TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(str(self.path), timeout=5, isolation_level=None)
+
+    def _acquire(self, name: str, holder: str, ttl: float) -> bool:
+        now = time.time()
+        conn = self._connect()
+        try:
+            # BEGIN IMMEDIATE toma el lock de escritura: leer y escribir es atómico
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT holder, expires_at FROM scheduler_leases WHERE name = ?", (name,)).fetchone()
+            if row is None or row[0] == holder or row[1] < now:
+                conn.execute(
+                    "INSERT OR REPLACE INTO scheduler_leases (name, holder, expires_at) VALUES (?, ?, ?)",
+                    (name, holder, now + ttl),
+                )
+                conn.execute("COMMIT")
+                return True
+            conn.execute("ROLLBACK")
+            return False
+        finally:
+            conn.close()
+
+    def _release(self, name: str, holder: str):
+        with self._connect() as conn:
+            conn.execute("UPDATE scheduler_leases SET expires_at = 0 WHERE name = ? AND holder = ?", (name, holder))
+
+    async def acquire(self, name: str, holder: str, ttl: float) -> bool:
+        return await asyncio.to_thread(self._acquire, name, holder, ttl)
+
+    async def release(self, name: str, holder: str):
+        await asyncio.to_thread(self._release, name, holder)
+
+
+def _iso(ts: datetime) -> str:
+    return ts.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+class PostgrestLeaseStore:
+    """Lease en la tabla scheduler_leases de Supabase (una fila por nombre de lease).
+
+    Tomar o renovar es un único PATCH condicionado a que el lease sea nuestro o esté
+    vencido; Postgres lo aplica de forma atómica, así que a lo sumo un proceso lo gana.
+    """
+
+    def __init__(self, client: Callable[[], httpx.AsyncClient], table: str = "scheduler_leases"):
+        self._client = client
+        self.table = table
+
+    async def acquire(self, name: str, holder: str, ttl: float) -> bool:
+        now = datetime.now(timezone.utc)
+        # Dentro de or=(...) el holder (hostname con puntos) y la fecha van entre comillas
+        for _ in range(2):
+            response = await self._client().patch(
+                f"/{self.table}",
+                params={"name": f"eq.{name}", "or": f"(holder.eq.{quote_value(holder)},expires_at.lt.{quote_value(_iso(now))})"},
+                json={"holder": holder, "expires_at": _iso(now + timedelta(seconds=ttl))},
+                headers={"Prefer": "return=representation"},
+            )
+            if response.status_code == 200 and response.json():
+                return True
+            # Puede que la fila todavía no exista: crearla vencida y reintentar una vez
+            created = await self._client().post(
+                f"/{self.table}",
+                params={"on_conflict": "name"},
+                json={"name": name, "holder": "", "expires_at": _iso(datetime.fromtimestamp(0, timezone.utc))},
+                headers={"Prefer": "return=representation,resolution=ignore-duplicates"},
+            )
+            if created.status_code not in (200, 201) or not created.json():
+                return False
+        return False
+
+    async def release(self, name: str, holder: str):
+        await self._client().patch(
+            f"/{self.table}",
+            params={"name": f"eq.{name}", "holder": f"eq.{holder}"},
+            json={"expires_at": _iso(datetime.fromtimestamp(0, timezone.utc))},
+            headers={"Prefer": "return=minimal"},
+        )
+
+
+class LeaseElector:
+    """Líder = el proceso que tiene el lease vigente"""
+
+    def __init__(self, store, name: str, ttl: float, holder: Optional[str] = None):
+        self.store = store
+        self.name = name
+        self.ttl = ttl
+        self.holder = holder or default_holder_id()
+
+    async def try_acquire(self) -> bool:
+        return await self.store.acquire(self.name, self.holder, self.ttl)
+
+    async def release(self):
+        await self.store.release(self.name, self.holder)
+
+
+class LeaderElection:
+    """Intenta tomar/renovar el liderazgo cada interval segundos y avisa los cambios"""
+
+    def __init__(self, elector, interval: float,
+                 on_elected: Callable[[], Optional[Awaitable[None]]],
+                 on_demoted: Callable[[], Optional[Awaitable[None]]]):
+        self.elector = elector
+        self.interval = interval
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.is_leader = False
+        self.since: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def _set_leader(self, leader: bool):
+        if leader == self.is_leader:
+            return
+        self.is_leader = leader
+        self.since = datetime.now(timezone.utc)
+        logging.info(f"Scheduler leadership {'acquired' if leader else 'lost'}")
+        result = self.on_elected() if leader else self.on_demoted()
+        if asyncio.iscoroutine(result):
+            await result
+
+    async def check(self):
+        try:
+            leader = await self.elector.try_acquire()
+        except Exception as e:
+            # Si no se puede confirmar el lease hay que asumir que se perdió
+            logging.error(f"Leader election check failed: {e}")
+            leader = False
+        await self._set_leader(leader)
+
+    async def _run(self):
+        while True:
+            await self.check()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.is_leader:
+            await self._set_leader(False)
+        try:
+            await self.elector.release()
+        except Exception as e:
+            logging.error(f"Could not release scheduler leadership: {e}")
+
+    def status(self):
+        return {
+            "elector": type(self.elector).__name__,
+            "is_leader": self.is_leader,
+            "since": self.since.isoformat() if self.since else None,
+        }
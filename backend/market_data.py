@@ -0,0 +1,251 @@
+"""
+InvestTracker - Cliente HTTP de Yahoo Finance
+=============================================
+
+Todas las consultas a Yahoo pasan por un único YahooClient que:
+
+    - reusa una sesión de requests con pool de conexiones (keep-alive);
+    - limita la tasa de pedidos con un token bucket;
+    - reintenta los 429/5xx y errores de red con backoff exponencial con jitter
+      (respetando Retry-After si viene);
+    - abre un circuit breaker tras varias fallas seguidas, así durante una caída de
+      Yahoo se falla al instante en vez de esperar timeouts;
+    - recuerda por un tiempo los símbolos que Yahoo reporta como inexistentes (caché
+      negativa) para no volver a pedirlos en cada corrida.
+
+Es sincrónico (como requests); desde código async se usa con asyncio.to_thread.
+"""
+
+import logging
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from cache import TTLCache
+
+
+YAHOO_BASE_URL = 'https://query1.finance.yahoo.com'
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class YahooUnavailable(Exception):
+    """Yahoo no respondió (circuito abierto o reintentos agotados)"""
+
+
+class TokenBucket:
+    """Limita a rate pedidos por segundo con ráfagas de hasta burst"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited = 0.0
+
+    def acquire(self):
+        """Toma un token, esperando lo necesario si el bucket está vacío"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            self.waited += wait
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """closed -> open tras failure_threshold fallas seguidas; tras reset_timeout deja
+    pasar un pedido de prueba (half_open) que lo cierra o lo vuelve a abrir"""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._trial_inflight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._trial_inflight:
+                self._trial_inflight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._trial_inflight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_inflight = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    logging.warning(f"Yahoo circuit breaker opened after {self.failures} failures")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+
+class YahooClient:
+    """Cliente compartido para los endpoints chart y spark de Yahoo"""
+
+    def __init__(self, rate: float = 5, burst: int = 10, max_retries: int = 3, backoff_base: float = 0.5,
+                 backoff_max: float = 8, timeout: float = 10, pool_size: int = 20,
+                 failure_threshold: int = 5, reset_timeout: float = 60, negative_ttl: float = 3600):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({'User-Agent': USER_AGENT})
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self._unknown = TTLCache(maxsize=10000, ttl=negative_ttl)
+        self._unknown_lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+
+    # Caché negativa -----------------------------------------------------------
+
+    def is_unknown(self, symbol: str) -> bool:
+        with self._unknown_lock:
+            return self._unknown.get(symbol) is not None
+
+    def mark_unknown(self, symbol: str):
+        with self._unknown_lock:
+            self._unknown.set(symbol, True)
+
+    # Pedidos -----------------------------------------------------------------
+
+    def _backoff(self, attempt: int, response: Optional[requests.Response]) -> float:
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.backoff_max)
+        # Full jitter: uniforme entre 0 y el tope exponencial
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _request(self, path: str, params: Dict) -> requests.Response:
+        """GET a Yahoo con rate limit, reintentos y circuit breaker; devuelve la respuesta final.
+
+        Lanza YahooUnavailable si el circuito está abierto o se agotaron los reintentos.
+        """
+        if not self.breaker.allow():
+            raise YahooUnavailable("circuit open")
+        response = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.retries += 1
+                time.sleep(self._backoff(attempt - 1, response))
+            self.bucket.acquire()
+            self.requests += 1
+            try:
+                response = self.session.get(f"{YAHOO_BASE_URL}{path}", params=params, timeout=self.timeout)
+            except requests.RequestException as e:
+                logging.warning(f"Yahoo request error for {path}: {e}")
+                response = None
+                continue
+            if response.status_code in RETRY_STATUS:
+                logging.warning(f"Yahoo responded {response.status_code} for {path}")
+                continue
+            self.breaker.record_success()
+            return response
+        self.breaker.record_failure()
+        raise YahooUnavailable(f"retries exhausted for {path}")
+
+    @staticmethod
+    def _body(response: requests.Response) -> Optional[Dict]:
+        # Los 404 de Yahoo también traen JSON, con el motivo en <endpoint>.error
+        if response.status_code not in (200, 404):
+            return None
+        try:
+            return response.json()
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _not_found(error: Optional[Dict]) -> bool:
+        return bool(error) and error.get('code') == 'Not Found'
+
+    def get_json(self, path: str, params: Dict) -> Optional[Dict]:
+        """GET a Yahoo; devuelve el JSON, o None si Yahoo no responde 200.
+
+        Lanza YahooUnavailable si el circuito está abierto o se agotaron los reintentos.
+        """
+        response = self._request(path, params)
+        return self._body(response) if response.status_code == 200 else None
+
+    def chart(self, symbol: str, params: Dict) -> Optional[Dict]:
+        """Primer resultado del endpoint chart, o None si el símbolo no tiene datos.
+
+        Solo un "Not Found" explícito de Yahoo (404 o chart.error) va a la caché negativa;
+        un rango vacío, un 400/401/403 o una falla de red no dicen nada del símbolo.
+        """
+        if self.is_unknown(symbol):
+            return None
+        response = self._request(f"/v8/finance/chart/{symbol}", params)
+        chart = (self._body(response) or {}).get('chart') or {}
+        if response.status_code == 404 or self._not_found(chart.get('error')):
+            self.mark_unknown(symbol)
+            return None
+        if response.status_code != 200 or not chart.get('result'):
+            return None
+        return chart['result'][0]
+
+    def spark(self, symbols, params: Dict) -> Dict[str, Optional[Dict]]:
+        """Primer resultado del endpoint spark por símbolo (None para los que no tienen datos).
+
+        Un símbolo va a la caché negativa solo si su propio ítem trae un "Not Found"; que
+        falte en la respuesta o que falle el lote entero no lo marca.
+        """
+        results = {symbol: None for symbol in symbols}
+        wanted = [s for s in symbols if not self.is_unknown(s)]
+        if not wanted:
+            return results
+        data = self.get_json('/v7/finance/spark', {**params, 'symbols': ','.join(wanted)})
+        for item in ((data or {}).get('spark') or {}).get('result') or []:
+            symbol = item.get('symbol')
+            if symbol not in results:
+                continue
+            if item.get('response'):
+                results[symbol] = item['response'][0]
+            elif self._not_found(item.get('error')):
+                self.mark_unknown(symbol)
+        return results
+
+    def stats(self) -> Dict:
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "rate_limit_wait_seconds": round(self.bucket.waited, 3),
+            "circuit": {
+                "state": self.breaker.state,
+                "failures": self.breaker.failures,
+                "rejected": self.breaker.rejected,
+            },
+            "unknown_symbols": len(self._unknown),
+        }
+
+    def close(self):
+        self.session.close()
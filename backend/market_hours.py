@@ -0,0 +1,189 @@
+"""
+InvestTracker - Horarios de mercado y política de polling
+=========================================================
+
+Sabe en qué mercado cotiza cada símbolo de Yahoo (los .BA en BYMA, el resto en
+NYSE/NASDAQ), el horario de rueda y los feriados de cada uno, y decide en cada tick
+del scheduler qué mercados hay que consultar:
+
+    - mercado abierto: cada poll_minutes minutos
+    - recién cerrado: una única consulta más para tomar el precio de cierre
+    - cerrado (noche, fin de semana, feriado): no se consulta
+
+Los feriados de NYSE y de BYMA se calculan por año con las reglas de cada calendario
+(nyse_holidays, byma_holidays). Los cierres que no siguen una regla (puentes turísticos
+por decreto, duelos nacionales) se agregan por configuración.
+"""
+
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Optional, Set
+from zoneinfo import ZoneInfo
+
+
+@dataclass
+class MarketSession:
+    """Rueda diaria de un mercado en su zona horaria"""
+    name: str
+    timezone: str
+    opens: time
+    closes: time
+    poll_minutes: float = 15
+    holidays: Set[date] = field(default_factory=set)
+    # Feriados por año según las reglas del mercado (además de holidays)
+    calendar: Optional[Callable[[int], Set[date]]] = None
+
+    def local(self, now: datetime) -> datetime:
+        return now.astimezone(ZoneInfo(self.timezone))
+
+    def is_trading_day(self, day: date) -> bool:
+        if day.weekday() >= 5 or day in self.holidays:
+            return False
+        return self.calendar is None or day not in self.calendar(day.year)
+
+    def is_open(self, now: datetime) -> bool:
+        local = self.local(now)
+        return self.is_trading_day(local.date()) and self.opens <= local.time() < self.closes
+
+    def last_close(self, now: datetime) -> Optional[datetime]:
+        """Último cierre de rueda anterior a now (buscando hasta 10 días atrás)"""
+        local = self.local(now)
+        for days_back in range(10):
+            day = local.date() - timedelta(days=days_back)
+            if not self.is_trading_day(day):
+                continue
+            close = datetime.combine(day, self.closes, tzinfo=local.tzinfo)
+            if close <= local:
+                return close
+        return None
+
+
+def parse_holidays(value: str) -> Set[date]:
+    """Convierte 'YYYY-MM-DD,YYYY-MM-DD,...' en un set de fechas"""
+    return {date.fromisoformat(d.strip()) for d in (value or "").split(",") if d.strip()}
+
+
+def easter(year: int) -> date:
+    """Domingo de Pascua (algoritmo gregoriano anónimo)"""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = divmod(b, 4)
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 19 * l) // 433
+    month, day = divmod(h + l - 7 * m + 90, 25)
+    return date(year, month, (h + l - 7 * m + 33 * month + 19) % 32)
+
+
+def nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    """n-ésimo weekday (0 = lunes) del mes; n = -1 es el último"""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _weekend_observed(day: date) -> date:
+    # Sábado -> viernes anterior, domingo -> lunes siguiente
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+@lru_cache(maxsize=32)
+def nyse_holidays(year: int) -> Set[date]:
+    """Feriados de NYSE/NASDAQ del año (reglas de la NYSE Rule 7.2)"""
+    holidays = {
+        nth_weekday(year, 1, 0, 3),                 # Martin Luther King Jr. Day
+        nth_weekday(year, 2, 0, 3),                 # Washington's Birthday
+        easter(year) - timedelta(days=2),           # Good Friday
+        nth_weekday(year, 5, 0, -1),                # Memorial Day
+        _weekend_observed(date(year, 7, 4)),        # Independence Day
+        nth_weekday(year, 9, 0, 1),                 # Labor Day
+        nth_weekday(year, 11, 3, 4),                # Thanksgiving
+        _weekend_observed(date(year, 12, 25)),      # Christmas
+    }
+    # Año nuevo en sábado no se compensa el viernes 31 (cerraría otro año)
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        holidays.add(_weekend_observed(new_year))
+    if year >= 2022:
+        holidays.add(_weekend_observed(date(year, 6, 19)))  # Juneteenth
+    return holidays
+
+
+def _movable(day: date) -> date:
+    # Ley 27.399: los trasladables de martes o miércoles pasan al lunes anterior y los de
+    # jueves o viernes al lunes siguiente
+    if day.weekday() in (1, 2):
+        return day - timedelta(days=day.weekday())
+    if day.weekday() in (3, 4):
+        return day + timedelta(days=7 - day.weekday())
+    return day
+
+
+@lru_cache(maxsize=32)
+def byma_holidays(year: int) -> Set[date]:
+    """Feriados nacionales en los que BYMA no opera (sin los puentes por decreto)"""
+    sunday = easter(year)
+    guemes = date(year, 6, 17)
+    # Paso a la Inmortalidad de Güemes: miércoles -> lunes anterior, jueves/viernes -> lunes siguiente
+    if guemes.weekday() == 2:
+        guemes -= timedelta(days=2)
+    elif guemes.weekday() in (3, 4):
+        guemes += timedelta(days=7 - guemes.weekday())
+    return {
+        date(year, 1, 1), date(year, 3, 24), date(year, 4, 2), date(year, 5, 1),
+        date(year, 5, 25), date(year, 6, 20), date(year, 7, 9), date(year, 12, 8),
+        date(year, 12, 25),
+        sunday - timedelta(days=48), sunday - timedelta(days=47),  # Carnaval
+        sunday - timedelta(days=3), sunday - timedelta(days=2),    # Jueves y Viernes Santo
+        guemes,
+        _movable(date(year, 8, 17)), _movable(date(year, 10, 12)), _movable(date(year, 11, 20)),
+    }
+
+
+def market_for_symbol(yahoo_ticker: str) -> str:
+    """Mercado en el que cotiza un símbolo de Yahoo (ver get_yahoo_ticker)"""
+    return "BCBA" if yahoo_ticker.upper().endswith(".BA") else "US"
+
+
+class PollingPolicy:
+    """Decide qué mercados consultar en cada tick y recuerda cuándo se consultó cada uno"""
+
+    def __init__(self, sessions: Iterable[MarketSession]):
+        self.sessions: Dict[str, MarketSession] = {s.name: s for s in sessions}
+        self._last_poll: Dict[str, datetime] = {}
+
+    def due_markets(self, now: datetime) -> Set[str]:
+        due = set()
+        for name, session in self.sessions.items():
+            last = self._last_poll.get(name)
+            if session.is_open(now):
+                if last is None or now - last >= timedelta(minutes=session.poll_minutes) - timedelta(seconds=1):
+                    due.add(name)
+                continue
+            # Cerrado: una sola consulta después del cierre para guardar el precio final
+            close = session.last_close(now)
+            if close is not None and (last is None or last < close):
+                due.add(name)
+        return due
+
+    def mark_polled(self, markets: Iterable[str], now: datetime):
+        for name in markets:
+            self._last_poll[name] = now
+
+    def status(self, now: datetime) -> Dict[str, Dict]:
+        return {
+            name: {
+                "open": session.is_open(now),
+                "poll_minutes": session.poll_minutes,
+                "last_poll": self._last_poll[name].isoformat() if name in self._last_poll else None,
+            }
+            for name, session in self.sessions.items()
+        }
@@ -0,0 +1,75 @@
+"""
+InvestTracker - Paginación por keyset sobre PostgREST
+=====================================================
+
+En vez de limit/offset (que obliga a Postgres a recorrer y descartar todas las filas
+anteriores, y se corre si alguien inserta o borra mientras se pagina) cada página
+pide las filas posteriores a la última vista según las columnas del orden:
+
+    order=user_id,id & or=(user_id.gt.U,and(user_id.eq.U,id.gt.I))
+
+Así cada página cuesta lo mismo sin importar lo profundo que esté.
+
+Las APIs de listado exponen la posición como un cursor opaco (base64 de los valores
+de la última fila entregada) que el cliente devuelve para pedir la página siguiente.
+"""
+
+import base64
+import json
+from typing import Any, Dict, List, Sequence
+
+
+def quote_value(value: Any) -> str:
+    """Valor entre comillas dobles para filtros or/and de PostgREST.
+
+    Así el valor puede llevar comas, puntos, dos puntos y paréntesis sin romper el filtro.
+    """
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def keyset_after(columns: Sequence[str], values: Sequence[Any], descending: bool = False) -> str:
+    """Filtro `or` de PostgREST con las filas que siguen a values en el orden de columns"""
+    op = "lt" if descending else "gt"
+    clauses = []
+    for i, column in enumerate(columns):
+        conditions = [f"{c}.eq.{quote_value(v)}" for c, v in zip(columns[:i], values[:i])]
+        conditions.append(f"{column}.{op}.{quote_value(values[i])}")
+        clauses.append(conditions[0] if len(conditions) == 1 else f"and({','.join(conditions)})")
+    return f"({','.join(clauses)})"
+
+
+def between(column: str, start: Any, end: Any) -> str:
+    """Filtro `and` de PostgREST para start <= column < end (un mismo parámetro no se repite)"""
+    return f"({column}.gte.{quote_value(start)},{column}.lt.{quote_value(end)})"
+
+
+def keyset_order(columns: Sequence[str], descending: bool = False) -> str:
+    """Parámetro order de PostgREST para recorrer por columns"""
+    return ",".join(f"{c}.desc" if descending else c for c in columns)
+
+
+def ensure_selected(params: Dict[str, str], columns: Sequence[str]) -> Dict[str, str]:
+    """Agrega al select las columnas del orden (hacen falta para armar la página siguiente)"""
+    select = params.get("select")
+    if not select or select.split(",")[0].strip() == "*":
+        return params
+    selected = [c.strip() for c in select.split(",")]
+    missing = [c for c in columns if c not in selected]
+    return {**params, "select": ",".join(selected + missing)} if missing else params
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Cursor opaco con los valores de orden de la última fila de una página"""
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """Valores de orden guardados en el cursor; ValueError si no es un cursor válido"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError("invalid cursor") from e
+    if not isinstance(values, list) or len(values) != size or not all(isinstance(v, (str, int, float)) for v in values):
+        raise ValueError("invalid cursor")
+    return values
@@ -0,0 +1,92 @@
+"""
+InvestTracker - Hash de contraseñas fuera del event loop
+========================================================
+
+bcrypt es lento a propósito (cientos de ms por llamada). Si se ejecuta dentro de un
+handler async bloquea todas las demás requests del worker, así que el hash y la
+verificación corren en un executor dedicado de tamaño fijo:
+
+    - "thread": ThreadPoolExecutor. bcrypt libera el GIL mientras calcula, así que
+      los hilos corren en paralelo sin el costo de serializar entre procesos.
+    - "process": ProcessPoolExecutor, por si la librería no libera el GIL.
+
+Las funciones de hash viven en este módulo (y no en server.py) para que los
+procesos hijos solo tengan que importar esto.
+"""
+
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict
+
+import bcrypt
+
+
+def hash_password(password: str) -> str:
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+
+
+def verify_password(password: str, hashed: str) -> bool:
+    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+
+
+EXECUTOR_MODES = ("thread", "process")
+
+
+class PasswordHasher:
+    """Ejecuta hash/verificación de bcrypt en un executor acotado y mide su latencia"""
+
+    def __init__(self, workers: int = 4, mode: str = "thread"):
+        if mode not in EXECUTOR_MODES:
+            raise ValueError(f"mode must be one of {EXECUTOR_MODES}")
+        self.workers = workers
+        self.mode = mode
+        self._executor: Executor = None
+        self.calls = 0
+        self.in_flight = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    @property
+    def executor(self) -> Executor:
+        # Se crea al primer uso para no levantar procesos al importar el módulo
+        if self._executor is None:
+            if self.mode == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def _run(self, fn, *args):
+        start = time.perf_counter()
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.in_flight -= 1
+            self.calls += 1
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run(verify_password, password, hashed)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict:
+        """Latencia de hash/verificación incluida la espera en cola del executor"""
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "calls": self.calls,
+            "in_flight": self.in_flight,
+            "avg_ms": round(self.total_seconds / self.calls * 1000, 2) if self.calls else 0.0,
+            "max_ms": round(self.max_seconds * 1000, 2),
+        }
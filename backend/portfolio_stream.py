@@ -0,0 +1,155 @@
+"""
+InvestTracker - Stream de valuación del portafolio
+==================================================
+
+Reparte las actualizaciones de precio que produce el scheduler a las conexiones
+abiertas (SSE) de cada usuario, como deltas por posición: precio, valor actual y
+ganancia/pérdida, más los totales del portafolio.
+
+Para que el fan-out escale a miles de conexiones por worker:
+    - el broker indexa los suscriptores por clave de ticker, así un precio nuevo solo
+      toca a quienes tienen ese ticker;
+    - publicar nunca bloquea: cada suscriptor acumula el último delta por posición
+      (los intermedios se pisan) y su conexión lo envía cuando puede;
+    - los totales se actualizan de forma incremental, sin recorrer el portafolio.
+"""
+
+import asyncio
+from collections import defaultdict
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+
+def position_values(quantity: float, avg_purchase_price: float, price: Optional[float]) -> Dict:
+    """Valor actual y ganancia/pérdida de una posición (None si no hay precio)"""
+    if not price:
+        return {"current_price": None, "current_value": None, "gain_loss": None, "gain_loss_pct": None}
+    investment = quantity * avg_purchase_price
+    current_value = quantity * price
+    gain_loss = current_value - investment
+    return {
+        "current_price": price,
+        "current_value": current_value,
+        "gain_loss": gain_loss,
+        "gain_loss_pct": (gain_loss / investment * 100) if investment > 0 else 0,
+    }
+
+
+class PortfolioSubscriber:
+    """Estado de una conexión: las posiciones del usuario y los deltas pendientes de enviar"""
+
+    def __init__(self, user_id: str, assets: Iterable[Tuple[Hashable, Dict]], prices: Dict[Hashable, Optional[float]]):
+        self.user_id = user_id
+        self.positions: Dict[str, Dict] = {}
+        self.by_key: Dict[Hashable, List[str]] = defaultdict(list)
+        self.total_investment = 0.0
+        self.current_value = 0.0
+        for key, asset in assets:
+            quantity = float(asset['quantity'])
+            avg_price = float(asset['avg_purchase_price'])
+            price = prices.get(key)
+            position = {
+                "asset_id": asset['id'],
+                "ticker": asset['ticker'],
+                "quantity": quantity,
+                "avg_purchase_price": avg_price,
+                **position_values(quantity, avg_price, price),
+            }
+            self.positions[asset['id']] = position
+            self.by_key[key].append(asset['id'])
+            self.total_investment += quantity * avg_price
+            self.current_value += self._value(position)
+        self._pending: Dict[str, Dict] = {}
+        self._ready = asyncio.Event()
+
+    @staticmethod
+    def _value(position: Dict) -> float:
+        # Sin precio la posición se valúa a costo, igual que /api/portfolio/summary
+        if position["current_value"] is None:
+            return position["quantity"] * position["avg_purchase_price"]
+        return position["current_value"]
+
+    def keys(self) -> List[Hashable]:
+        return list(self.by_key)
+
+    def apply(self, key: Hashable, price: float):
+        """Aplica un precio nuevo a las posiciones del ticker y deja el delta pendiente"""
+        for asset_id in self.by_key.get(key, ()):
+            position = self.positions[asset_id]
+            if position["current_price"] == price:
+                continue
+            self.current_value -= self._value(position)
+            position.update(position_values(position["quantity"], position["avg_purchase_price"], price))
+            self.current_value += self._value(position)
+            self._pending[asset_id] = position
+            self._ready.set()
+
+    def summary(self) -> Dict:
+        gain_loss = self.current_value - self.total_investment
+        return {
+            "total_investment": self.total_investment,
+            "current_value": self.current_value,
+            "total_gain_loss": gain_loss,
+            "total_gain_loss_pct": (gain_loss / self.total_investment * 100) if self.total_investment > 0 else 0,
+            "assets_count": len(self.positions),
+        }
+
+    def snapshot(self) -> Dict:
+        return {"positions": list(self.positions.values()), "summary": self.summary()}
+
+    async def next_delta(self, timeout: float) -> Optional[Dict]:
+        """Espera deltas hasta timeout; devuelve las posiciones cambiadas y los totales, o None"""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+        self._ready.clear()
+        positions = [dict(p) for p in self._pending.values()]
+        self._pending.clear()
+        return {"positions": positions, "summary": self.summary()}
+
+
+class PortfolioBroker:
+    """Índice ticker -> suscriptores y último precio publicado por ticker"""
+
+    def __init__(self):
+        self._subscribers: Dict[Hashable, Set[PortfolioSubscriber]] = defaultdict(set)
+        self._connections = 0
+        self._last_price: Dict[Hashable, float] = {}
+        self.published = 0
+        self.deliveries = 0
+
+    def subscribe(self, subscriber: PortfolioSubscriber):
+        self._connections += 1
+        for key in subscriber.keys():
+            self._subscribers[key].add(subscriber)
+
+    def unsubscribe(self, subscriber: PortfolioSubscriber):
+        self._connections -= 1
+        for key in subscriber.keys():
+            subs = self._subscribers.get(key)
+            if subs is not None:
+                subs.discard(subscriber)
+                if not subs:
+                    del self._subscribers[key]
+
+    def keys(self) -> List[Hashable]:
+        """Claves de ticker con al menos un suscriptor"""
+        return list(self._subscribers)
+
+    def publish(self, key: Hashable, price: Optional[float]):
+        """Publica un precio; solo notifica si cambió respecto del último publicado"""
+        if not price or self._last_price.get(key) == price:
+            return
+        self._last_price[key] = price
+        self.published += 1
+        for subscriber in self._subscribers.get(key, ()):
+            subscriber.apply(key, price)
+            self.deliveries += 1
+
+    def stats(self) -> Dict:
+        return {
+            "connections": self._connections,
+            "tickers": len(self._subscribers),
+            "published": self.published,
+            "deliveries": self.deliveries,
+        }
@@ -0,0 +1,172 @@
+"""
+InvestTracker - Rollups OHLC de price_history
+=============================================
+
+Compacta los ticks crudos de price_history en velas OHLC de 1h, 1d y 1w (tabla
+price_rollups) y elige de qué nivel servir una consulta según el rango y la
+resolución pedidos.
+
+Cada nivel se calcula a partir del anterior:
+    price_history (ticks) -> 1h -> 1d -> 1w
+"""
+
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+
+
+# Niveles de rollup de más fino a más grueso
+TIERS = {
+    "1h": timedelta(hours=1),
+    "1d": timedelta(days=1),
+    "1w": timedelta(weeks=1),
+}
+
+# Tramo que procesa cada paso del rollup incremental (múltiplo del ancho de la vela):
+# acota cuántas velas hay en memoria a la vez
+ROLLUP_WINDOWS = {
+    "1h": timedelta(days=1),
+    "1d": timedelta(weeks=1),
+    "1w": timedelta(weeks=4),
+}
+
+_DURATION_RE = re.compile(r"^(\d+)(mo|m|h|d|w|y)$")
+_DURATION_UNITS = {
+    "m": timedelta(minutes=1),
+    "h": timedelta(hours=1),
+    "d": timedelta(days=1),
+    "w": timedelta(weeks=1),
+    "mo": timedelta(days=30),
+    "y": timedelta(days=365),
+}
+
+_EPOCH_MONDAY = datetime(1970, 1, 5, tzinfo=timezone.utc)
+
+
+def parse_duration(value: str) -> timedelta:
+    """Convierte '15m', '4h', '1d', '2w', '3mo' o '1y' en un timedelta"""
+    match = _DURATION_RE.match(value.strip().lower())
+    if not match or int(match.group(1)) <= 0:
+        raise ValueError(f"Invalid duration: {value}")
+    return int(match.group(1)) * _DURATION_UNITS[match.group(2)]
+
+
+def parse_timestamp(value: str) -> datetime:
+    ts = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+def bucket_start(ts: datetime, width: timedelta) -> datetime:
+    """Inicio del bucket que contiene ts (las semanas arrancan el lunes, en UTC)"""
+    offset = (ts - _EPOCH_MONDAY) // width
+    return _EPOCH_MONDAY + offset * width
+
+
+class BarAggregator:
+    """Velas OHLC que se arman fila a fila, sin guardar las filas.
+
+    Guarda solo el estado de cada vela (ticker, inicio) abierta, así la memoria depende de
+    la cantidad de velas y no de la de ticks o velas finas que las forman. Las filas
+    pueden llegar en cualquier orden.
+    """
+
+    def __init__(self, resolution: str, width: Optional[timedelta] = None):
+        self.resolution = resolution
+        self.width = width or TIERS[resolution]
+        # (ticker, inicio) -> [ts_open, open, high, low, ts_close, close, samples]
+        self._bars: Dict[tuple, list] = {}
+
+    def __len__(self) -> int:
+        return len(self._bars)
+
+    def _add(self, ticker: str, ts: datetime, open_: float, high: float, low: float, close: float, samples: int):
+        key = (ticker, bucket_start(ts, self.width))
+        bar = self._bars.get(key)
+        if bar is None:
+            self._bars[key] = [ts, open_, high, low, ts, close, samples]
+            return
+        if ts < bar[0]:
+            bar[0], bar[1] = ts, open_
+        bar[2] = max(bar[2], high)
+        bar[3] = min(bar[3], low)
+        if ts >= bar[4]:
+            bar[4], bar[5] = ts, close
+        bar[6] += samples
+
+    def add_tick(self, row: Dict):
+        """Suma un tick crudo de price_history (ticker, price, timestamp)"""
+        price = float(row["price"])
+        self._add(row["ticker"], parse_timestamp(row["timestamp"]), price, price, price, price, 1)
+
+    def add_bar(self, bar: Dict):
+        """Suma una vela de un nivel más fino"""
+        self._add(
+            bar["ticker"], parse_timestamp(bar["bucket_start"]),
+            float(bar["open"]), float(bar["high"]), float(bar["low"]), float(bar["close"]),
+            int(bar.get("samples") or 1),
+        )
+
+    def bars(self) -> List[Dict]:
+        """Velas armadas, ordenadas por ticker e inicio"""
+        return [
+            {
+                "ticker": ticker,
+                "resolution": self.resolution,
+                "bucket_start": start.isoformat(),
+                "open": open_,
+                "high": high,
+                "low": low,
+                "close": close,
+                "samples": samples,
+            }
+            for (ticker, start), (_, open_, high, low, _, close, samples) in sorted(self._bars.items())
+        ]
+
+
+def rollup_ticks(rows: Iterable[Dict], resolution: str, width: Optional[timedelta] = None) -> List[Dict]:
+    """Agrupa ticks crudos de price_history (ticker, price, timestamp) en velas OHLC"""
+    aggregator = BarAggregator(resolution, width)
+    for row in rows:
+        aggregator.add_tick(row)
+    return aggregator.bars()
+
+
+def rollup_bars(bars: Iterable[Dict], resolution: str, width: Optional[timedelta] = None) -> List[Dict]:
+    """Agrupa velas de un nivel más fino en velas de la resolución indicada.
+
+    width permite reagrupar en anchos arbitrarios (p.ej. 4h a partir de velas de 1h).
+    """
+    aggregator = BarAggregator(resolution, width)
+    for bar in bars:
+        aggregator.add_bar(bar)
+    return aggregator.bars()
+
+
+def source_tier(resolution: timedelta) -> str:
+    """Nivel más grueso cuyas velas encajan exactamente en la resolución pedida.
+
+    Devuelve 'raw' si ningún nivel sirve (resolución menor a 1h o no múltiplo de 1h).
+    """
+    tier = "raw"
+    for name, width in TIERS.items():
+        if resolution % width == timedelta(0):
+            tier = name
+    return tier
+
+
+def covers(tier: str, span: timedelta, retention: Optional[Dict[str, Optional[timedelta]]]) -> bool:
+    """True si el nivel conserva datos de todo el rango (retention: nivel -> tiempo, None = sin límite)"""
+    kept = (retention or {}).get(tier)
+    return kept is None or span <= kept
+
+
+def auto_resolution(span: timedelta, max_points: int, raw_interval: timedelta,
+                    retention: Optional[Dict[str, Optional[timedelta]]] = None) -> timedelta:
+    """Resolución más fina que no supera max_points en el rango (ticks crudos si alcanzan).
+
+    Con retention se saltean los niveles que ya borraron parte del rango.
+    """
+    for width in (raw_interval, *TIERS.values()):
+        if span / width <= max_points and covers(source_tier(width), span, retention):
+            return width
+    return TIERS["1w"]
@@ -0,0 +1,59 @@
+"""
+InvestTracker - Serialización rápida de listados
+================================================
+
+Los endpoints que devuelven listas construían un modelo Pydantic por fila a mano y
+FastAPI después los volvía a validar y los pasaba por jsonable_encoder + json.dumps.
+RowSerializer hace todo en pydantic-core (Rust):
+
+    - valida la lista completa de filas de PostgREST de una vez con un TypeAdapter;
+    - los nombres de columna se mapean a los campos de la API en el propio modelo,
+      con column("id") (validation alias), en vez de copiarlos campo por campo;
+    - serializa directo a bytes JSON y devuelve un Response ya armado, así FastAPI no
+      vuelve a validar ni codificar.
+
+Uso:
+    class Asset(BaseModel):
+        model_config = ConfigDict(extra="ignore", populate_by_name=True)
+        asset_id: str = column("id")
+        ...
+
+    assets_json = RowSerializer(Asset)
+    return assets_json.response(rows)
+
+Medir con: python benchmarks/bench_serialization.py
+"""
+
+from typing import Any, Generic, Iterable, List, Type, TypeVar
+
+from fastapi import Response
+from pydantic import BaseModel, Field, TypeAdapter
+
+
+M = TypeVar("M", bound=BaseModel)
+
+
+def column(name: str, **kwargs: Any) -> Any:
+    """Campo que se llena desde la columna `name` de PostgREST.
+
+    El modelo debe tener populate_by_name=True para seguir aceptando el nombre del campo
+    (p.ej. Asset(asset_id=...)).
+    """
+    return Field(validation_alias=name, **kwargs)
+
+
+class RowSerializer(Generic[M]):
+    """Valida en bloque filas de PostgREST contra List[model] y las serializa a JSON"""
+
+    def __init__(self, model: Type[M]):
+        self.model = model
+        self.adapter = TypeAdapter(List[model])
+
+    def validate(self, rows: Iterable[dict]) -> List[M]:
+        return self.adapter.validate_python(rows if isinstance(rows, list) else list(rows))
+
+    def dump_json(self, rows: Iterable[dict]) -> bytes:
+        return self.adapter.dump_json(self.validate(rows))
+
+    def response(self, rows: Iterable[dict], status_code: int = 200) -> Response:
+        return Response(content=self.dump_json(rows), status_code=status_code, media_type="application/json")
@@ -1,21 +1,40 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Request, status
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 import os
+import json
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr, ConfigDict
 from typing import List, Optional, Literal
 import uuid
-from datetime import datetime, timezone, timedelta
-import bcrypt
+import time
+from datetime import datetime, timezone, timedelta, time as dt_time
 import jwt
 from contextlib import asynccontextmanager
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 import asyncio
 import resend
-import requests
+import httpx
+
+from alert_engine import AlertIndex
+from cache import TTLCache
+from chart_cache import ChartCache, merge_points
+from leader import FileLockElector, LeaderElection, LeaseElector, PostgrestLeaseStore, SqliteLeaseStore
+from market_data import YahooClient, YahooUnavailable
+from market_hours import MarketSession, PollingPolicy, byma_holidays, market_for_symbol, nyse_holidays, parse_holidays
+from pagination import between, decode_cursor, encode_cursor, ensure_selected, keyset_after, keyset_order
+from passwords import PasswordHasher
+from portfolio_stream import PortfolioBroker, PortfolioSubscriber, position_values
+from rollups import (
+    ROLLUP_WINDOWS, TIERS, BarAggregator, auto_resolution, bucket_start, covers, parse_duration, parse_timestamp,
+    rollup_bars, rollup_ticks, source_tier,
+)
+from serialization import RowSerializer, column
+from symbol_cache import SymbolCache
+from write_buffer import WriteBehindBuffer
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -24,6 +43,18 @@ load_dotenv(ROOT_DIR / '.env')
 SUPABASE_URL = os.environ.get('SUPABASE_URL')
 SUPABASE_KEY = os.environ.get('SUPABASE_SERVICE_KEY') or os.environ.get('SUPABASE_KEY')
 
+# Pool de conexiones HTTP compartido (keep-alive) para la API REST de Supabase
+SUPABASE_MAX_CONNECTIONS = int(os.environ.get('SUPABASE_MAX_CONNECTIONS', '20'))
+SUPABASE_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get('SUPABASE_MAX_KEEPALIVE_CONNECTIONS', '10'))
+SUPABASE_KEEPALIVE_EXPIRY = float(os.environ.get('SUPABASE_KEEPALIVE_EXPIRY', '30'))
+SUPABASE_TIMEOUT = float(os.environ.get('SUPABASE_TIMEOUT', '10'))
+SUPABASE_CONNECT_TIMEOUT = float(os.environ.get('SUPABASE_CONNECT_TIMEOUT', '5'))
+SUPABASE_POOL_TIMEOUT = float(os.environ.get('SUPABASE_POOL_TIMEOUT', '5'))
+# Filas por página en las lecturas masivas (no superar el max-rows de PostgREST)
+SUPABASE_PAGE_SIZE = int(os.environ.get('SUPABASE_PAGE_SIZE', '1000'))
+
+_supabase_client: Optional[httpx.AsyncClient] = None
+
 def supabase_headers():
     return {
         "apikey": SUPABASE_KEY,
@@ -32,37 +63,197 @@ def supabase_headers():
         "Prefer": "return=representation"
     }
 
-def supabase_get(table: str, params: dict = None):
+def get_supabase_client() -> httpx.AsyncClient:
+    """Devuelve el cliente async compartido, creándolo la primera vez que se usa"""
+    global _supabase_client
+    if _supabase_client is None or _supabase_client.is_closed:
+        _supabase_client = httpx.AsyncClient(
+            base_url=f"{SUPABASE_URL}/rest/v1",
+            headers=supabase_headers(),
+            limits=httpx.Limits(
+                max_connections=SUPABASE_MAX_CONNECTIONS,
+                max_keepalive_connections=SUPABASE_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=SUPABASE_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(
+                SUPABASE_TIMEOUT,
+                connect=SUPABASE_CONNECT_TIMEOUT,
+                pool=SUPABASE_POOL_TIMEOUT,
+            ),
+        )
+    return _supabase_client
+
+async def close_supabase_client():
+    """Cierra el pool de conexiones (se llama al apagar la app)"""
+    global _supabase_client
+    if _supabase_client is not None:
+        await _supabase_client.aclose()
+        _supabase_client = None
+
+async def supabase_get(table: str, params: dict = None):
     """GET request to Supabase REST API"""
-    url = f"{SUPABASE_URL}/rest/v1/{table}"
-    response = requests.get(url, headers=supabase_headers(), params=params)
+    response = await get_supabase_client().get(f"/{table}", params=params)
     if response.status_code == 200:
         return response.json()
     return []
 
-def supabase_post(table: str, data: dict):
+async def supabase_post(table: str, data: dict):
     """POST request to Supabase REST API"""
-    url = f"{SUPABASE_URL}/rest/v1/{table}"
-    response = requests.post(url, headers=supabase_headers(), json=data)
+    response = await get_supabase_client().post(f"/{table}", json=data)
     if response.status_code in [200, 201]:
         result = response.json()
         return result[0] if result else None
     return None
 
-def supabase_patch(table: str, match: dict, data: dict):
+async def supabase_patch(table: str, match: dict, data: dict):
     """PATCH request to Supabase REST API"""
-    url = f"{SUPABASE_URL}/rest/v1/{table}"
     params = {f"{k}": f"eq.{v}" for k, v in match.items()}
-    response = requests.patch(url, headers=supabase_headers(), params=params, json=data)
+    response = await get_supabase_client().patch(f"/{table}", params=params, json=data)
     return response.status_code in [200, 204]
 
-def supabase_delete(table: str, match: dict):
+async def supabase_delete(table: str, match: dict):
     """DELETE request to Supabase REST API"""
-    url = f"{SUPABASE_URL}/rest/v1/{table}"
     params = {f"{k}": f"eq.{v}" for k, v in match.items()}
-    response = requests.delete(url, headers=supabase_headers(), params=params)
+    response = await get_supabase_client().delete(f"/{table}", params=params)
+    return response.status_code in [200, 204]
+
+async def supabase_update(table: str, match: dict, data: dict, select: str = None) -> list:
+    """PATCH de las filas que cumplen todos los filtros de match; devuelve las filas actualizadas.
+
+    La propiedad se expresa como filtro (p.ej. {"id": ..., "user_id": ...}): una lista
+    vacía significa que la fila no existe o es de otro usuario.
+    """
+    params = {k: f"eq.{v}" for k, v in match.items()}
+    if select:
+        params["select"] = select
+    response = await get_supabase_client().patch(f"/{table}", params=params, json=data)
+    return response.json() if response.status_code == 200 else []
+
+async def supabase_remove(table: str, match: dict, select: str = "id") -> list:
+    """DELETE de las filas que cumplen todos los filtros de match; devuelve las filas borradas"""
+    params = {k: f"eq.{v}" for k, v in match.items()}
+    params["select"] = select
+    response = await get_supabase_client().delete(f"/{table}", params=params)
+    return response.json() if response.status_code == 200 else []
+
+async def supabase_insert_many(table: str, rows: list, ignore_duplicates: bool = False):
+    """POST multi-fila a Supabase REST API (una sola transacción).
+
+    Con ignore_duplicates las filas cuyo id ya existe se omiten, así un reintento
+    no duplica lo que ya se había guardado.
+    """
+    prefer = "return=minimal"
+    params = None
+    if ignore_duplicates:
+        prefer += ",resolution=ignore-duplicates"
+        params = {"on_conflict": "id"}
+    response = await get_supabase_client().post(
+        f"/{table}", params=params, json=rows, headers={"Prefer": prefer}
+    )
+    return response.status_code in [200, 201, 204]
+
+async def supabase_upsert_many(table: str, rows: list, on_conflict: str):
+    """POST multi-fila con merge-duplicates: inserta o actualiza según on_conflict"""
+    response = await get_supabase_client().post(
+        f"/{table}", params={"on_conflict": on_conflict}, json=rows,
+        headers={"Prefer": "return=minimal,resolution=merge-duplicates"},
+    )
+    return response.status_code in [200, 201, 204]
+
+async def supabase_delete_where(table: str, params: dict):
+    """DELETE con filtros PostgREST arbitrarios (p.ej. {"timestamp": "lt.2024-01-01"})"""
+    response = await get_supabase_client().delete(
+        f"/{table}", params=params, headers={"Prefer": "return=minimal"}
+    )
     return response.status_code in [200, 204]
 
+async def supabase_update_in(table: str, column: str, values: list, data: dict, params: dict = None,
+                             select: str = None) -> Optional[list]:
+    """PATCH de las filas cuyo column está en values (filtro in.(...)) y cumplen params.
+
+    Devuelve las filas que efectivamente cambiaron (solo las columnas de select, por
+    defecto column), o None si el pedido falló. values no debería pasar de
+    IN_FILTER_MAX_VALUES para que la URL no crezca sin límite.
+    """
+    params = {**(params or {}), column: f"in.({','.join(str(v) for v in values)})", "select": select or column}
+    response = await get_supabase_client().patch(f"/{table}", params=params, json=data)
+    return response.json() if response.status_code == 200 else None
+
+async def supabase_count(table: str, params: dict = None, method: str = "exact") -> Optional[int]:
+    """Cuenta filas del lado del servidor (HEAD con Prefer: count=exact|planned|estimated)"""
+    response = await get_supabase_client().head(
+        f"/{table}", params=params, headers={"Prefer": f"count={method}"}
+    )
+    content_range = response.headers.get("content-range", "")
+    if response.status_code in [200, 206] and "/" in content_range:
+        total = content_range.rsplit("/", 1)[1]
+        if total.isdigit():
+            return int(total)
+    return None
+
+_background_tasks = set()
+
+def spawn(coro):
+    """Ejecuta una corrutina en segundo plano guardando la referencia hasta que termine"""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+async def supabase_iter(table: str, params: dict = None, order: tuple = ("id",), descending: bool = False,
+                        page_size: int = None):
+    """Recorre todas las filas que cumplen el filtro, de a páginas de page_size.
+
+    Pagina por keyset sobre las columnas de order (ver pagination.py), así la memoria
+    queda acotada a una página y ninguna fila se saltea aunque la tabla cambie o el
+    servidor recorte las páginas a menos filas (max-rows): solo se corta con una página
+    vacía. Un error de PostgREST se propaga en vez de terminar la recorrida en silencio.
+    """
+    page_size = page_size or SUPABASE_PAGE_SIZE
+    params = ensure_selected(params or {}, order)
+    after = None
+    while True:
+        query = {**params, "order": keyset_order(order, descending), "limit": str(page_size)}
+        if after is not None:
+            query["or"] = keyset_after(order, after, descending)
+        response = await get_supabase_client().get(f"/{table}", params=query)
+        response.raise_for_status()
+        page = response.json()
+        if not page:
+            return
+        for row in page:
+            yield row
+        after = [page[-1][column] for column in order]
+
+async def supabase_page(table: str, params: dict, order: tuple, descending: bool, limit: int,
+                        cursor: Optional[str] = None) -> tuple:
+    """Una página por keyset: (filas, cursor de la siguiente o None si no hay más).
+
+    Pide limit + 1 filas para saber si hay otra página sin contar. Lanza HTTPException
+    400 si el cursor no es válido.
+    """
+    query = {**ensure_selected(params, order), "order": keyset_order(order, descending), "limit": str(limit + 1)}
+    if cursor:
+        try:
+            query["or"] = keyset_after(order, decode_cursor(cursor, len(order)), descending)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    rows = await supabase_get(table, query)
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor([rows[-1][column] for column in order])
+
+def with_next_cursor(response: Response, next_cursor: Optional[str]) -> Response:
+    """Agrega el header X-Next-Cursor (el cuerpo sigue siendo la lista de la página)"""
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response
+
+async def supabase_get_all(table: str, params: dict = None, page_size: int = None):
+    """GET paginado: lee todas las filas que cumplen el filtro en páginas de page_size"""
+    return [row async for row in supabase_iter(table, params, page_size=page_size)]
+
 logging.info("Configured Supabase REST API connection")
 
 # Resend setup
@@ -76,20 +267,244 @@ SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'your-secret-key-change-in-product
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
 
+# Caché de cotizaciones en memoria, por símbolo de Yahoo
+PRICE_CACHE_TTL = float(os.environ.get('PRICE_CACHE_TTL', '120'))
+PRICE_CACHE_MAXSIZE = int(os.environ.get('PRICE_CACHE_MAXSIZE', '5000'))
+price_cache = TTLCache(maxsize=PRICE_CACHE_MAXSIZE, ttl=PRICE_CACHE_TTL)
+
+# Caché compartida entre workers/dynos: la tabla price_cache que escribe el scheduler.
+# Una cotización más vieja que SHARED_PRICE_MAX_AGE segundos se vuelve a pedir a Yahoo;
+# los workers con streams abiertos leen las nuevas cada SHARED_PRICE_SYNC_SECONDS.
+SHARED_PRICE_MAX_AGE = float(os.environ.get('SHARED_PRICE_MAX_AGE', '1200'))
+SHARED_PRICE_SYNC_SECONDS = float(os.environ.get('SHARED_PRICE_SYNC_SECONDS', '15'))
+
+# Escritura en lote de las alertas disparadas por el scheduler
+# (los filtros id=in.(...) van en la URL: se parten de a IN_FILTER_MAX_VALUES ids)
+IN_FILTER_MAX_VALUES = 100
+ALERT_WRITE_BATCH_SIZE = int(os.environ.get('ALERT_WRITE_BATCH_SIZE', '500'))
+ALERT_WRITE_RETRIES = int(os.environ.get('ALERT_WRITE_RETRIES', '3'))
+ALERT_WRITE_RETRY_DELAY = float(os.environ.get('ALERT_WRITE_RETRY_DELAY', '0.5'))
+
+# El índice de alertas del scheduler se pone al día con los cambios de la base en cada
+# corrida y se recarga completo cada ALERT_INDEX_RELOAD_MINUTES (suelta las borradas)
+ALERT_INDEX_RELOAD_MINUTES = float(os.environ.get('ALERT_INDEX_RELOAD_MINUTES', '60'))
+
+# Buffer de escritura diferida para price_history (inserts multi-fila)
+PRICE_HISTORY_BATCH_SIZE = int(os.environ.get('PRICE_HISTORY_BATCH_SIZE', '500'))
+PRICE_HISTORY_FLUSH_INTERVAL = float(os.environ.get('PRICE_HISTORY_FLUSH_INTERVAL', '5'))
+PRICE_HISTORY_MAX_BUFFERED = int(os.environ.get('PRICE_HISTORY_MAX_BUFFERED', '20000'))
+PRICE_HISTORY_OVERFLOW_POLICY = os.environ.get('PRICE_HISTORY_OVERFLOW_POLICY', 'drop_oldest')
+price_history_buffer = WriteBehindBuffer(
+    lambda rows: supabase_insert_many("price_history", rows, ignore_duplicates=True),
+    name="price_history",
+    batch_size=PRICE_HISTORY_BATCH_SIZE,
+    flush_interval=PRICE_HISTORY_FLUSH_INTERVAL,
+    max_rows=PRICE_HISTORY_MAX_BUFFERED,
+    overflow_policy=PRICE_HISTORY_OVERFLOW_POLICY,
+)
+
+# Rollups OHLC de price_history (1h, 1d, 1w) y retención de cada nivel
+PRICE_ROLLUP_INTERVAL_MINUTES = int(os.environ.get('PRICE_ROLLUP_INTERVAL_MINUTES', '60'))
+PRICE_HISTORY_RAW_RETENTION_DAYS = int(os.environ.get('PRICE_HISTORY_RAW_RETENTION_DAYS', '7'))
+PRICE_ROLLUP_1H_RETENTION_DAYS = int(os.environ.get('PRICE_ROLLUP_1H_RETENTION_DAYS', '90'))
+PRICE_ROLLUP_1D_RETENTION_DAYS = int(os.environ.get('PRICE_ROLLUP_1D_RETENTION_DAYS', '1825'))
+# Hasta dónde hacia atrás tiene datos cada nivel (las velas de 1w no se borran)
+TIER_RETENTION = {
+    "raw": timedelta(days=PRICE_HISTORY_RAW_RETENTION_DAYS),
+    "1h": timedelta(days=PRICE_ROLLUP_1H_RETENTION_DAYS),
+    "1d": timedelta(days=PRICE_ROLLUP_1D_RETENTION_DAYS),
+    "1w": None,
+}
+PRICE_HISTORY_MAX_POINTS = int(os.environ.get('PRICE_HISTORY_MAX_POINTS', '500'))
+# Cada cuánto escribe el scheduler un tick crudo (para elegir resolución automática)
+PRICE_HISTORY_RAW_INTERVAL = timedelta(minutes=15)
+
+# Mapear período a intervalo apropiado
+CHART_INTERVALS = {
+    "1d": "5m",
+    "5d": "15m",
+    "1mo": "1d",
+    "3mo": "1d",
+    "6mo": "1d",
+    "1y": "1wk",
+    "5y": "1mo"
+}
+# Cuánta historia se guarda por intervalo (el período más largo que lo usa)
+CHART_MAX_SPAN = {}
+for _period, _interval in CHART_INTERVALS.items():
+    CHART_MAX_SPAN[_interval] = max(CHART_MAX_SPAN.get(_interval, 0), int(parse_duration(_period).total_seconds()))
+
+# Caché en disco de las series de Yahoo (sobrevive reinicios)
+CHART_CACHE_PATH = Path(os.environ.get('CHART_CACHE_PATH', str(ROOT_DIR / 'chart_cache.sqlite3')))
+CHART_CACHE_MAX_BYTES = int(os.environ.get('CHART_CACHE_MAX_BYTES', str(50 * 1024 * 1024)))
+CHART_CACHE_MAX_AGE_DAYS = float(os.environ.get('CHART_CACHE_MAX_AGE_DAYS', '30'))
+CHART_CACHE_REFRESH_SECONDS = float(os.environ.get('CHART_CACHE_REFRESH_SECONDS', '60'))
+chart_cache = ChartCache(CHART_CACHE_PATH, max_bytes=CHART_CACHE_MAX_BYTES, max_age=CHART_CACHE_MAX_AGE_DAYS * 86400)
+
+# Horarios de rueda por mercado. El job price_checker corre cada
+# MARKET_SCHEDULER_TICK_MINUTES y la política decide qué mercados consultar: los abiertos
+# cada MARKET_POLL_MINUTES_<MERCADO>, una consulta al cierre, y nada con el mercado cerrado.
+# Los feriados salen del calendario de cada mercado; MARKET_HOLIDAYS_<MERCADO> agrega
+# los cierres que no siguen una regla (puentes por decreto, duelos).
+MARKET_SCHEDULER_TICK_MINUTES = float(os.environ.get('MARKET_SCHEDULER_TICK_MINUTES', '1'))
+polling_policy = PollingPolicy([
+    MarketSession(
+        name="BCBA",
+        timezone="America/Argentina/Buenos_Aires",
+        opens=dt_time(11, 0),
+        closes=dt_time(17, 0),
+        poll_minutes=float(os.environ.get('MARKET_POLL_MINUTES_BCBA', '15')),
+        holidays=parse_holidays(os.environ.get('MARKET_HOLIDAYS_BCBA', '')),
+        calendar=byma_holidays,
+    ),
+    MarketSession(
+        name="US",
+        timezone="America/New_York",
+        opens=dt_time(9, 30),
+        closes=dt_time(16, 0),
+        poll_minutes=float(os.environ.get('MARKET_POLL_MINUTES_US', '15')),
+        holidays=parse_holidays(os.environ.get('MARKET_HOLIDAYS_US', '')),
+        calendar=nyse_holidays,
+    ),
+])
+# Último precio conocido por clave de ticker (para valuar mercados cerrados)
+last_quotes = {}
+
+# Snapshots de portafolio que calcula el scheduler (segundos de vigencia máxima)
+PORTFOLIO_SNAPSHOT_MAX_AGE = float(os.environ.get('PORTFOLIO_SNAPSHOT_MAX_AGE', '1800'))
+
+# Stream SSE del portafolio (segundos entre keepalives)
+PORTFOLIO_STREAM_KEEPALIVE = float(os.environ.get('PORTFOLIO_STREAM_KEEPALIVE', '15'))
+portfolio_broker = PortfolioBroker()
+
+# Contador en memoria de notificaciones no leídas por usuario. El TTL acota cuánto
+# puede desviarse si otro worker escribe notificaciones del mismo usuario.
+UNREAD_COUNT_TTL = float(os.environ.get('UNREAD_COUNT_TTL', '30'))
+UNREAD_COUNT_MAXSIZE = int(os.environ.get('UNREAD_COUNT_MAXSIZE', '10000'))
+# exact | planned | estimated (ver Prefer: count= de PostgREST)
+NOTIFICATION_COUNT_METHOD = os.environ.get('NOTIFICATION_COUNT_METHOD', 'exact')
+unread_counts = TTLCache(maxsize=UNREAD_COUNT_MAXSIZE, ttl=UNREAD_COUNT_TTL)
+
+# Símbolo de Yahoo que resolvió cada activo, persistido en disco y revalidado cada
+# SYMBOL_CACHE_REVALIDATE_SECONDS
+SYMBOL_CACHE_PATH = Path(os.environ.get('SYMBOL_CACHE_PATH', str(ROOT_DIR / 'symbol_cache.sqlite3')))
+SYMBOL_CACHE_REVALIDATE_SECONDS = float(os.environ.get('SYMBOL_CACHE_REVALIDATE_SECONDS', str(7 * 86400)))
+symbol_cache = SymbolCache(SYMBOL_CACHE_PATH, revalidate_after=SYMBOL_CACHE_REVALIDATE_SECONDS)
+
+# Cliente de Yahoo compartido: tasa máxima (pedidos/s y ráfaga), reintentos con backoff,
+# circuit breaker y cuánto se recuerda un símbolo sin datos (segundos)
+YAHOO_RATE_LIMIT = float(os.environ.get('YAHOO_RATE_LIMIT', '5'))
+YAHOO_RATE_BURST = int(os.environ.get('YAHOO_RATE_BURST', '10'))
+YAHOO_MAX_RETRIES = int(os.environ.get('YAHOO_MAX_RETRIES', '3'))
+YAHOO_BACKOFF_BASE = float(os.environ.get('YAHOO_BACKOFF_BASE', '0.5'))
+YAHOO_BACKOFF_MAX = float(os.environ.get('YAHOO_BACKOFF_MAX', '8'))
+YAHOO_TIMEOUT = float(os.environ.get('YAHOO_TIMEOUT', '10'))
+YAHOO_POOL_SIZE = int(os.environ.get('YAHOO_POOL_SIZE', '20'))
+YAHOO_CIRCUIT_FAILURES = int(os.environ.get('YAHOO_CIRCUIT_FAILURES', '5'))
+YAHOO_CIRCUIT_RESET = float(os.environ.get('YAHOO_CIRCUIT_RESET', '60'))
+YAHOO_NEGATIVE_TTL = float(os.environ.get('YAHOO_NEGATIVE_TTL', '3600'))
+yahoo_client = YahooClient(
+    rate=YAHOO_RATE_LIMIT,
+    burst=YAHOO_RATE_BURST,
+    max_retries=YAHOO_MAX_RETRIES,
+    backoff_base=YAHOO_BACKOFF_BASE,
+    backoff_max=YAHOO_BACKOFF_MAX,
+    timeout=YAHOO_TIMEOUT,
+    pool_size=YAHOO_POOL_SIZE,
+    failure_threshold=YAHOO_CIRCUIT_FAILURES,
+    reset_timeout=YAHOO_CIRCUIT_RESET,
+    negative_ttl=YAHOO_NEGATIVE_TTL,
+)
+
+# Paginación por cursor de los listados: tamaño de página máximo que puede pedir el
+# cliente (limit + 1 debe quedar bajo el max-rows de PostgREST)
+API_PAGE_MAX_LIMIT = int(os.environ.get('API_PAGE_MAX_LIMIT', '500'))
+
+# Símbolos por consulta en el endpoint multi-símbolo de Yahoo (scheduler)
+YAHOO_BATCH_SIZE = int(os.environ.get('YAHOO_BATCH_SIZE', '20'))
+
+# Obtención de precios en paralelo para los endpoints del portafolio
+PRICE_FETCH_CONCURRENCY = int(os.environ.get('PRICE_FETCH_CONCURRENCY', '8'))
+PRICE_FETCH_DEADLINE = float(os.environ.get('PRICE_FETCH_DEADLINE', '8'))
+
 security = HTTPBearer()
 
+# Caché de tokens verificados (hasta su expiración, como máximo TOKEN_CACHE_TTL) y de
+# perfiles de usuario para /api/auth/me
+TOKEN_CACHE_MAXSIZE = int(os.environ.get('TOKEN_CACHE_MAXSIZE', '10000'))
+TOKEN_CACHE_TTL = float(os.environ.get('TOKEN_CACHE_TTL', '3600'))
+USER_PROFILE_CACHE_TTL = float(os.environ.get('USER_PROFILE_CACHE_TTL', '30'))
+token_cache = TTLCache(maxsize=TOKEN_CACHE_MAXSIZE, ttl=TOKEN_CACHE_TTL)
+user_profile_cache = TTLCache(maxsize=TOKEN_CACHE_MAXSIZE, ttl=USER_PROFILE_CACHE_TTL)
+
+# bcrypt corre en un executor dedicado para no bloquear el event loop (thread | process)
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', '4'))
+PASSWORD_HASH_EXECUTOR = os.environ.get('PASSWORD_HASH_EXECUTOR', 'thread')
+password_hasher = PasswordHasher(workers=PASSWORD_HASH_WORKERS, mode=PASSWORD_HASH_EXECUTOR)
+
 # Scheduler
 scheduler = AsyncIOScheduler()
 
+# Un solo proceso corre los jobs aunque haya varios workers/dynos:
+#   file   -> lock de archivo (todos los workers en el mismo host)
+#   lease  -> fila con vencimiento en la tabla scheduler_leases de Supabase (varios hosts)
+#   sqlite -> el mismo lease emulado en un archivo SQLite local
+#   none   -> sin elección (cada proceso corre el scheduler)
+SCHEDULER_LEADER_MODE = os.environ.get('SCHEDULER_LEADER_MODE', 'file')
+SCHEDULER_LOCK_PATH = Path(os.environ.get('SCHEDULER_LOCK_PATH', str(ROOT_DIR / 'scheduler.lock')))
+SCHEDULER_LEASE_PATH = Path(os.environ.get('SCHEDULER_LEASE_PATH', str(ROOT_DIR / 'scheduler_lease.sqlite3')))
+# Vigencia del lease y cada cuánto se renueva (o se intenta tomar): el failover tarda a
+# lo sumo SCHEDULER_LEASE_TTL + SCHEDULER_LEADER_CHECK_SECONDS
+SCHEDULER_LEASE_TTL = float(os.environ.get('SCHEDULER_LEASE_TTL', '30'))
+SCHEDULER_LEADER_CHECK_SECONDS = float(os.environ.get('SCHEDULER_LEADER_CHECK_SECONDS', '5'))
+
+def on_scheduler_demoted():
+    """Pausa los jobs y descarta el índice de alertas (lo mantiene el nuevo líder)"""
+    scheduler.pause()
+    reset_alert_index()
+
+def build_leader_election():
+    if SCHEDULER_LEADER_MODE == 'none':
+        return None
+    if SCHEDULER_LEADER_MODE == 'lease':
+        elector = LeaseElector(PostgrestLeaseStore(get_supabase_client), 'price_checker', SCHEDULER_LEASE_TTL)
+    elif SCHEDULER_LEADER_MODE == 'sqlite':
+        elector = LeaseElector(SqliteLeaseStore(SCHEDULER_LEASE_PATH), 'price_checker', SCHEDULER_LEASE_TTL)
+    else:
+        elector = FileLockElector(SCHEDULER_LOCK_PATH)
+    return LeaderElection(
+        elector,
+        interval=SCHEDULER_LEADER_CHECK_SECONDS,
+        on_elected=scheduler.resume,
+        on_demoted=on_scheduler_demoted,
+    )
+
+leader_election = build_leader_election()
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    scheduler.start()
-    scheduler.add_job(check_prices_and_alerts, 'interval', minutes=15, id='price_checker')
-    logging.info("Scheduler started - checking prices every 15 minutes")
+    price_history_buffer.start()
+    # Con elección de líder los jobs arrancan pausados hasta que este proceso gane
+    scheduler.start(paused=leader_election is not None)
+    scheduler.add_job(run_scheduled_price_check, 'interval', minutes=MARKET_SCHEDULER_TICK_MINUTES, id='price_checker')
+    scheduler.add_job(rollup_price_history, 'interval', minutes=PRICE_ROLLUP_INTERVAL_MINUTES, id='price_rollups')
+    if leader_election is not None:
+        leader_election.start()
+    shared_price_sync = asyncio.create_task(sync_shared_prices())
+    logging.info(f"Scheduler started - checking open markets every {MARKET_SCHEDULER_TICK_MINUTES} minutes")
     yield
     # Shutdown
+    shared_price_sync.cancel()
+    if leader_election is not None:
+        await leader_election.stop()
     scheduler.shutdown()
+    await price_history_buffer.close()
+    chart_cache.close()
+    yahoo_client.close()
+    symbol_cache.close()
+    password_hasher.shutdown()
+    await close_supabase_client()
 
 app = FastAPI(lifespan=lifespan)
 api_router = APIRouter(prefix="/api")
@@ -112,8 +527,8 @@ class User(BaseModel):
     created_at: str
 
 class Asset(BaseModel):
-    model_config = ConfigDict(extra="ignore")
-    asset_id: str
+    model_config = ConfigDict(extra="ignore", populate_by_name=True)
+    asset_id: str = column("id")
     user_id: str
     asset_type: Literal["CEDEAR", "Acción", "Obligación Negociable"]
     ticker: str
@@ -121,7 +536,7 @@ class Asset(BaseModel):
     avg_purchase_price: float
     purchase_date: str
     market: str
-    created_at: str
+    created_at: str = ""
 
 class AssetCreate(BaseModel):
     asset_type: Literal["CEDEAR", "Acción", "Obligación Negociable"]
@@ -140,15 +555,15 @@ class AssetUpdate(BaseModel):
     market: Optional[str] = None
 
 class Alert(BaseModel):
-    model_config = ConfigDict(extra="ignore")
-    alert_id: str
+    model_config = ConfigDict(extra="ignore", populate_by_name=True)
+    alert_id: str = column("id")
     user_id: str
     asset_id: str
     alert_type: Literal["target_buy", "target_sell", "stop_loss", "take_profit"]
     target_value: float
     is_percentage: bool
     is_active: bool
-    created_at: str
+    created_at: str = ""
 
 class AlertCreate(BaseModel):
     asset_id: str
@@ -163,19 +578,20 @@ class AlertUpdate(BaseModel):
     is_active: Optional[bool] = None
 
 class AlertHistory(BaseModel):
-    model_config = ConfigDict(extra="ignore")
-    history_id: str
+    model_config = ConfigDict(extra="ignore", populate_by_name=True)
+    history_id: str = column("id")
     user_id: str
-    asset_id: str
-    ticker: str
-    alert_type: str
-    current_price: float
-    message: str
-    sent_at: str
+    # alert_history.asset_id es ON DELETE SET NULL: queda en null al borrar el activo
+    asset_id: Optional[str] = None
+    ticker: str = ""
+    alert_type: str = ""
+    current_price: float = 0
+    message: str = ""
+    sent_at: str = ""
 
 class Notification(BaseModel):
-    model_config = ConfigDict(extra="ignore")
-    notification_id: str
+    model_config = ConfigDict(extra="ignore", populate_by_name=True)
+    notification_id: str = column("id")
     user_id: str
     title: str
     message: str
@@ -183,7 +599,7 @@ class Notification(BaseModel):
     ticker: Optional[str] = None
     current_price: Optional[float] = None
     is_read: bool = False
-    created_at: str
+    created_at: str = ""
 
 class PriceHistory(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -198,6 +614,8 @@ class PortfolioSummary(BaseModel):
     total_gain_loss: float
     total_gain_loss_pct: float
     assets_count: int
+    computed_at: Optional[str] = None
+    snapshot_age_seconds: Optional[float] = None
 
 class AssetWithPrice(BaseModel):
     asset: Asset
@@ -207,68 +625,161 @@ class AssetWithPrice(BaseModel):
     gain_loss_pct: Optional[float]
     recommendation: Optional[str]
 
-# Helper functions
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+class Dashboard(BaseModel):
+    summary: PortfolioSummary
+    assets: List[AssetWithPrice]
+    notifications: List[Notification]
+    unread_count: int
 
-def verify_password(password: str, hashed: str) -> bool:
-    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+# Serializadores de listados: filas de PostgREST -> JSON validado en bloque
+assets_json = RowSerializer(Asset)
+alerts_json = RowSerializer(Alert)
+alert_history_json = RowSerializer(AlertHistory)
+notifications_json = RowSerializer(Notification)
+assets_with_price_json = RowSerializer(AssetWithPrice)
 
+# Helper functions
 def create_token(user_id: str) -> str:
     expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode = {"sub": user_id, "exp": expire}
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
+def decode_token(token: str) -> str:
+    """Valida el JWT y devuelve el user_id (sub).
+
+    Los tokens ya verificados se guardan en una caché LRU hasta su expiración, así las
+    rutas autenticadas no vuelven a decodificar y verificar la firma en cada request.
+    """
+    user_id = token_cache.get(token)
+    if user_id is not None:
+        return user_id
     try:
-        token = credentials.credentials
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
         if user_id is None:
             raise HTTPException(status_code=401, detail="Invalid token")
+        ttl = payload["exp"] - time.time() if "exp" in payload else TOKEN_CACHE_TTL
+        token_cache.set(token, user_id, ttl=min(ttl, TOKEN_CACHE_TTL))
         return user_id
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.JWTError:
+    except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
+    return decode_token(credentials.credentials)
+
+async def get_stream_user(token: Optional[str] = None,
+                          credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False))) -> str:
+    """Como get_current_user, pero acepta el token por query (?token=) porque EventSource no envía headers"""
+    if credentials:
+        return decode_token(credentials.credentials)
+    if token:
+        return decode_token(token)
+    raise HTTPException(status_code=403, detail="Not authenticated")
+
 def get_price_from_yahoo_api(ticker: str) -> Optional[float]:
     """Obtiene precio usando la API de Yahoo Finance directamente (más confiable que yfinance)"""
     try:
         logging.info(f"Calling Yahoo Finance API for ticker: {ticker}")
-        url = f'https://query1.finance.yahoo.com/v8/finance/chart/{ticker}'
-        params = {'interval': '1d', 'range': '1d'}
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        
-        response = requests.get(url, params=params, headers=headers, timeout=10)
-        logging.info(f"Yahoo API response status for {ticker}: {response.status_code}")
+        result = yahoo_client.chart(ticker, {'interval': '1d', 'range': '1d'})
         
-        if response.status_code == 200:
-            data = response.json()
-            if 'chart' in data and 'result' in data['chart'] and data['chart']['result']:
-                result = data['chart']['result'][0]
-                # Intentar obtener el precio del mercado regular
-                if 'meta' in result and 'regularMarketPrice' in result['meta']:
-                    price = float(result['meta']['regularMarketPrice'])
-                    logging.info(f"Got price for {ticker}: {price}")
-                    return price
-                # Fallback: usar el último precio de cierre
-                if 'indicators' in result and 'quote' in result['indicators']:
-                    quotes = result['indicators']['quote'][0]
-                    if 'close' in quotes and quotes['close']:
-                        closes = [c for c in quotes['close'] if c is not None]
-                        if closes:
-                            price = float(closes[-1])
-                            logging.info(f"Got close price for {ticker}: {price}")
-                            return price
+        if result:
+            # Intentar obtener el precio del mercado regular
+            if 'meta' in result and 'regularMarketPrice' in result['meta']:
+                price = float(result['meta']['regularMarketPrice'])
+                logging.info(f"Got price for {ticker}: {price}")
+                return price
+            # Fallback: usar el último precio de cierre
+            if 'indicators' in result and 'quote' in result['indicators']:
+                quotes = result['indicators']['quote'][0]
+                if 'close' in quotes and quotes['close']:
+                    closes = [c for c in quotes['close'] if c is not None]
+                    if closes:
+                        price = float(closes[-1])
+                        logging.info(f"Got close price for {ticker}: {price}")
+                        return price
         
         logging.warning(f"No price data in Yahoo API response for {ticker}")
     except Exception as e:
         logging.error(f"Yahoo Finance API error for {ticker}: {e}")
     return None
 
+def fetch_yahoo_chart(yahoo_ticker: str, interval: str, period: str = None, since: int = None) -> Optional[dict]:
+    """Descarga una serie del endpoint chart de Yahoo: el rango completo (period) o desde since"""
+    params = {'interval': interval}
+    if since is not None:
+        params['period1'] = since
+        params['period2'] = int(time.time())
+    else:
+        params['range'] = period
+    
+    try:
+        result = yahoo_client.chart(yahoo_ticker, params)
+    except YahooUnavailable as e:
+        logging.warning(f"Yahoo chart unavailable for {yahoo_ticker}: {e}")
+        return None
+    
+    if result:
+        timestamps = result.get('timestamp') or []
+        quotes = result.get('indicators', {}).get('quote', [{}])[0]
+        closes = quotes.get('close') or []
+        return {
+            "current_price": (result.get('meta') or {}).get('regularMarketPrice'),
+            "points": [(ts, float(c)) for ts, c in zip(timestamps, closes) if c is not None],
+        }
+    return None
+
+def get_chart_series(yahoo_ticker: str, period: str) -> Optional[dict]:
+    """Serie de precios del período usando la caché en disco.
+
+    Si la caché ya cubre el período solo se pide a Yahoo la cola desde el último timestamp
+    guardado (y nada si se actualizó hace menos de CHART_CACHE_REFRESH_SECONDS).
+    """
+    interval = CHART_INTERVALS.get(period, "1d")
+    try:
+        span = int(parse_duration(period).total_seconds())
+    except ValueError:
+        # Período que Yahoo entiende pero no sabemos medir: sin caché
+        return fetch_yahoo_chart(yahoo_ticker, interval, period=period)
+    
+    now = int(time.time())
+    start = now - span
+    keep_since = now - CHART_MAX_SPAN.get(interval, span)
+    entry = chart_cache.load(yahoo_ticker, interval)
+    
+    if entry and entry["points"] and entry["covered_from"] <= start:
+        if time.time() - entry["fetched_at"] < CHART_CACHE_REFRESH_SECONDS:
+            series = entry
+        else:
+            fresh = fetch_yahoo_chart(yahoo_ticker, interval, since=entry["points"][-1][0])
+            if fresh is None:
+                # Si Yahoo falla se sirve lo que hay en caché
+                series = entry
+            else:
+                series = {
+                    "current_price": fresh["current_price"] or entry["current_price"],
+                    "points": merge_points(entry["points"], fresh["points"], keep_since),
+                }
+                chart_cache.store(yahoo_ticker, interval, series["points"],
+                                  max(entry["covered_from"], keep_since), series["current_price"])
+    else:
+        fresh = fetch_yahoo_chart(yahoo_ticker, interval, period=period)
+        if fresh is None:
+            return None
+        covered_from = min(start, entry["covered_from"]) if entry else start
+        series = {
+            "current_price": fresh["current_price"],
+            "points": merge_points(entry["points"] if entry else [], fresh["points"], keep_since),
+        }
+        chart_cache.store(yahoo_ticker, interval, series["points"],
+                          max(covered_from, keep_since), series["current_price"])
+    
+    return {
+        "current_price": series["current_price"],
+        "points": [p for p in series["points"] if p[0] >= start],
+    }
+
 def get_yahoo_ticker(ticker: str, market: str, asset_type: str) -> str:
     """Convierte el ticker al formato de Yahoo Finance según el mercado"""
     ticker_upper = ticker.upper()
@@ -290,36 +801,343 @@ def get_yahoo_ticker(ticker: str, market: str, asset_type: str) -> str:
     # Por defecto, retornar el ticker tal cual
     return ticker_upper
 
-async def get_current_price(ticker: str, market: str = "NYSE", asset_type: str = "CEDEAR") -> Optional[float]:
-    # Convertir ticker al formato de Yahoo Finance
-    yahoo_ticker = get_yahoo_ticker(ticker, market, asset_type)
-    logging.info(f"Fetching price for {ticker} (market={market}, type={asset_type}) -> Yahoo ticker: {yahoo_ticker}")
+def symbol_candidates(ticker: str, market: str, asset_type: str) -> List[str]:
+    """Símbolos de Yahoo a probar para un activo, en orden.
+
+    Primero el que resolvió la última vez (si está vigente en symbol_cache); si no, el de
+    get_yahoo_ticker y luego el ticker sin sufijo (por si es un ADR).
+    """
+    primary = get_yahoo_ticker(ticker, market, asset_type)
+    candidates = [primary] if primary == ticker.upper() else [primary, ticker.upper()]
+    resolved = symbol_cache.get((ticker, market, asset_type))
+    if resolved:
+        candidates = [resolved] + [c for c in candidates if c != resolved]
+    return candidates
+
+async def fetch_current_price(ticker: str, market: str = "NYSE", asset_type: str = "CEDEAR") -> Optional[float]:
+    """Consulta el precio a Yahoo sin pasar por la caché"""
+    # Convertir ticker al formato de Yahoo Finance (o usar el que ya resolvió)
+    candidates = symbol_candidates(ticker, market, asset_type)
+    logging.info(f"Fetching price for {ticker} (market={market}, type={asset_type}) -> Yahoo symbols: {candidates}")
     
-    # Try Yahoo Finance API directamente
-    price = await asyncio.to_thread(get_price_from_yahoo_api, yahoo_ticker)
-    logging.info(f"Yahoo Finance API result for {yahoo_ticker}: {price}")
-    if price:
-        return price
-    
-    # Si falla con .BA, intentar sin sufijo (por si es un ADR)
-    if yahoo_ticker != ticker.upper():
-        logging.info(f"Retrying without suffix: {ticker.upper()}")
-        price = await asyncio.to_thread(get_price_from_yahoo_api, ticker.upper())
-        logging.info(f"Retry result for {ticker.upper()}: {price}")
+    for yahoo_ticker in candidates:
+        price = await asyncio.to_thread(get_price_from_yahoo_api, yahoo_ticker)
+        logging.info(f"Yahoo Finance API result for {yahoo_ticker}: {price}")
         if price:
+            symbol_cache.record((ticker, market, asset_type), yahoo_ticker)
             return price
     
     logging.warning(f"Could not fetch price for {ticker}")
     return None
 
-async def save_price_history(ticker: str, price: float):
+async def read_shared_prices(symbols: set, since: datetime = None) -> dict:
+    """Cotizaciones de la tabla price_cache, por símbolo de Yahoo: {símbolo: (precio, updated_at)}.
+
+    Solo devuelve las que tienen a lo sumo SHARED_PRICE_MAX_AGE segundos (o las
+    actualizadas después de since) y las deja también en la caché en memoria. Los
+    símbolos se consultan en paralelo de a IN_FILTER_MAX_VALUES por pedido.
+    """
+    if not symbols:
+        return {}
+    now = datetime.now(timezone.utc)
+    if since is None:
+        since = now - timedelta(seconds=SHARED_PRICE_MAX_AGE)
+    symbols = sorted(symbols)
+    pages = await asyncio.gather(*(
+        supabase_get("price_cache", {
+            "select": "ticker,price,updated_at",
+            "ticker": f"in.({','.join(symbols[start:start + IN_FILTER_MAX_VALUES])})",
+            "updated_at": f"gt.{since.isoformat()}",
+        })
+        for start in range(0, len(symbols), IN_FILTER_MAX_VALUES)
+    ))
+    quotes = {}
+    for row in (row for page in pages for row in page):
+        updated_at = parse_timestamp(row['updated_at'])
+        price = float(row['price'])
+        quotes[row['ticker']] = (price, updated_at)
+        remaining = SHARED_PRICE_MAX_AGE - (now - updated_at).total_seconds()
+        if remaining > 0:
+            price_cache.set(row['ticker'], price, ttl=min(PRICE_CACHE_TTL, remaining))
+    return quotes
+
+async def write_shared_prices(prices: dict):
+    """Upsert en lote de {símbolo de Yahoo: precio} en la tabla price_cache"""
+    now = datetime.now(timezone.utc).isoformat()
+    rows = [{"ticker": symbol, "price": price, "updated_at": now} for symbol, price in prices.items() if price]
+    if rows and not await supabase_upsert_many("price_cache", rows, on_conflict="ticker"):
+        logging.error(f"Could not update shared price cache ({len(rows)} quotes)")
+
+async def load_current_price(ticker: str, market: str, asset_type: str, shared: bool = True) -> Optional[float]:
+    """Carga de un miss de price_cache: primero la cotización compartida (si shared), si no Yahoo"""
+    yahoo_ticker = get_yahoo_ticker(ticker, market, asset_type)
+    if shared:
+        try:
+            quotes = await read_shared_prices({yahoo_ticker})
+        except httpx.HTTPError as e:
+            logging.warning(f"Shared price cache unavailable: {e}")
+            quotes = {}
+        if yahoo_ticker in quotes:
+            return quotes[yahoo_ticker][0]
+    price = await fetch_current_price(ticker, market, asset_type)
+    if price:
+        # Los demás workers la toman de la tabla en vez de volver a pedirla
+        spawn(write_shared_prices({yahoo_ticker: price}))
+    return price
+
+async def get_current_price(ticker: str, market: str = "NYSE", asset_type: str = "CEDEAR",
+                            shared: bool = True) -> Optional[float]:
+    """Precio actual leído de la caché; los misses concurrentes del mismo símbolo comparten una consulta.
+
+    shared=False saltea la lectura de la tabla price_cache (el llamador ya la hizo en lote).
+    """
+    yahoo_ticker = get_yahoo_ticker(ticker, market, asset_type)
+    return await price_cache.get_or_load(
+        yahoo_ticker, lambda: load_current_price(ticker, market, asset_type, shared)
+    )
+
+def get_prices_from_yahoo_batch(symbols: List[str]) -> dict:
+    """Obtiene precios de varios símbolos en una sola consulta al endpoint spark de Yahoo"""
+    prices = {symbol: None for symbol in symbols}
+    try:
+        logging.info(f"Calling Yahoo Finance spark API for {len(symbols)} symbols")
+        results = yahoo_client.spark(symbols, {'interval': '1d', 'range': '1d'})
+        
+        for symbol, result in results.items():
+            if not result:
+                continue
+            # Intentar obtener el precio del mercado regular
+            meta = result.get('meta') or {}
+            if meta.get('regularMarketPrice') is not None:
+                prices[symbol] = float(meta['regularMarketPrice'])
+                continue
+            # Fallback: usar el último precio de cierre
+            quotes = (result.get('indicators') or {}).get('quote') or [{}]
+            closes = [c for c in quotes[0].get('close') or [] if c is not None]
+            if closes:
+                prices[symbol] = float(closes[-1])
+    except Exception as e:
+        logging.error(f"Yahoo Finance spark API error for {symbols}: {e}")
+    return prices
+
+async def fetch_yahoo_prices(symbols: set) -> dict:
+    """Consulta una lista de símbolos de Yahoo en lotes de YAHOO_BATCH_SIZE"""
+    symbols = sorted(symbols)
+    batches = [symbols[i:i + YAHOO_BATCH_SIZE] for i in range(0, len(symbols), YAHOO_BATCH_SIZE)]
+    prices = {}
+    for result in await asyncio.gather(*(asyncio.to_thread(get_prices_from_yahoo_batch, b) for b in batches)):
+        prices.update(result)
+    return prices
+
+async def refresh_current_prices(keys: set) -> dict:
+    """Consulta precios frescos para muchas claves (ticker, mercado, tipo) y los deja en la caché.
+
+    Usado por el scheduler: resuelve cada clave con symbol_candidates, pide los símbolos en
+    lotes y reintenta con la variante alternativa los que vuelven vacíos (por si es un ADR).
+    Las cotizaciones se guardan también en la tabla price_cache para los demás workers.
+    """
+    candidates = {key: symbol_candidates(*key) for key in keys}
+    quotes = await fetch_yahoo_prices({c[0] for c in candidates.values()})
+    
+    # Las claves sin precio prueban su siguiente variante (p.ej. sin el sufijo .BA)
+    retry = {
+        c[1] for c in candidates.values()
+        if not quotes.get(c[0]) and len(c) > 1 and not quotes.get(c[1])
+    }
+    if retry:
+        logging.info(f"Retrying {len(retry)} symbols with their alternate Yahoo symbol")
+        quotes.update(await fetch_yahoo_prices(retry))
+    
+    prices = {}
+    for key, symbols in candidates.items():
+        symbol = next((c for c in symbols if quotes.get(c)), None)
+        price = quotes.get(symbol) if symbol else None
+        if symbol:
+            symbol_cache.record(key, symbol)
+        else:
+            logging.warning(f"Could not fetch price for {key[0]}")
+        prices[key] = price
+        price_cache.set(get_yahoo_ticker(*key), price)
+        portfolio_broker.publish(key, price)
+        if price:
+            last_quotes[key] = price
+    
+    # Compartir la corrida con los demás workers/dynos
+    await write_shared_prices({get_yahoo_ticker(*key): price for key, price in prices.items()})
+    return prices
+
+def asset_price_key(asset: dict) -> tuple:
+    """Clave (ticker, mercado, tipo) con la que se resuelve el precio de un activo"""
+    return (asset['ticker'], asset.get('market', 'NYSE'), asset.get('asset_type', 'CEDEAR'))
+
+def compute_portfolio_snapshot(user_id: str, assets: list, prices: dict, as_of: datetime = None) -> dict:
+    """Totales y valores por posición de un portafolio (sin precio, la posición se valúa a costo).
+
+    as_of es cuándo se leyeron los activos (computed_at): un snapshot anterior a la última
+    modificación de los activos no se sirve (ver fresh_portfolio_summary).
+    """
+    total_investment = 0
+    current_value = 0
+    positions = []
+    
+    for asset in assets:
+        quantity = float(asset['quantity'])
+        investment = quantity * float(asset['avg_purchase_price'])
+        total_investment += investment
+        
+        price = prices.get(asset_price_key(asset))
+        values = position_values(quantity, float(asset['avg_purchase_price']), price)
+        current_value += values['current_value'] if price else investment
+        positions.append({"asset_id": asset['id'], "ticker": asset['ticker'], **values})
+    
+    gain_loss = current_value - total_investment
+    gain_loss_pct = (gain_loss / total_investment * 100) if total_investment > 0 else 0
+    
+    return {
+        "user_id": user_id,
+        "total_investment": total_investment,
+        "current_value": current_value,
+        "total_gain_loss": gain_loss,
+        "total_gain_loss_pct": gain_loss_pct,
+        "assets_count": len(assets),
+        "positions": positions,
+        "computed_at": (as_of or datetime.now(timezone.utc)).isoformat(),
+    }
+
+async def last_known_prices(keys: set) -> dict:
+    """Último precio conocido de claves (ticker, mercado, tipo) sin cotización nueva.
+
+    Busca en last_quotes, en la caché en memoria y por último en la tabla price_cache, sin
+    límite de antigüedad: para un mercado cerrado (o recién reiniciado el proceso) el
+    último cierre vale más que valuar a costo. Lo encontrado queda en last_quotes.
+    """
+    found = {}
+    missing = {}
+    for key in keys:
+        symbol = get_yahoo_ticker(*key)
+        price = last_quotes.get(key) or price_cache.peek(symbol)
+        if price:
+            found[key] = price
+        else:
+            missing.setdefault(symbol, []).append(key)
+    symbols = sorted(missing)
+    for start in range(0, len(symbols), IN_FILTER_MAX_VALUES):
+        rows = await supabase_get("price_cache", {
+            "select": "ticker,price",
+            "ticker": f"in.({','.join(symbols[start:start + IN_FILTER_MAX_VALUES])})",
+        })
+        for row in rows:
+            for key in missing.get(row['ticker'], ()):
+                found[key] = float(row['price'])
+    last_quotes.update(found)
+    return found
+
+async def save_portfolio_snapshots(prices: dict):
+    """Recalcula y guarda el snapshot de cada usuario que tiene algún ticker con precio nuevo.
+
+    prices son las cotizaciones de la corrida (las claves sin precio se ignoran); el resto
+    de las posiciones se valúa con last_known_prices. Recorre assets ordenados por usuario:
+    en memoria hay un solo lote de portafolios a la vez, sin importar el tamaño de la tabla.
+    """
+    prices = {key: price for key, price in prices.items() if price}
+    if not prices:
+        return
+    pending = []
+    saved = 0
+    
+    async def flush():
+        nonlocal saved
+        if not pending:
+            return
+        keys = {asset_price_key(a) for _, user_assets in pending for a in user_assets} - prices.keys()
+        known = {**await last_known_prices(keys), **prices}
+        batch = [compute_portfolio_snapshot(uid, user_assets, known, as_of) for uid, user_assets in pending]
+        await supabase_upsert_many("portfolio_snapshots", batch, on_conflict="user_id")
+        saved += len(batch)
+        pending.clear()
+    
+    as_of = datetime.now(timezone.utc)
+    user_id, user_assets = None, []
+    async for asset in supabase_iter("assets", order=("user_id", "id")):
+        if asset['user_id'] != user_id:
+            if any(asset_price_key(a) in prices for a in user_assets):
+                pending.append((user_id, user_assets))
+            if len(pending) >= SUPABASE_PAGE_SIZE:
+                await flush()
+            user_id, user_assets = asset['user_id'], []
+        user_assets.append(asset)
+    if any(asset_price_key(a) in prices for a in user_assets):
+        pending.append((user_id, user_assets))
+    await flush()
+    logging.info(f"Saved {saved} portfolio snapshots")
+
+async def invalidate_portfolio_snapshot(user_id: str):
+    """Borra el snapshot de un usuario cuyos activos cambiaron.
+
+    Se espera antes de responder para que la relectura que hace el frontend ya no lo vea.
+    Un snapshot que el scheduler escriba después con activos leídos antes del cambio lo
+    descarta fresh_portfolio_summary.
+    """
+    if not await supabase_delete("portfolio_snapshots", {"user_id": user_id}):
+        logging.warning(f"Could not delete portfolio snapshot for user {user_id}")
+
+async def get_prices_for_assets(assets: list, deadline: float = None) -> dict:
+    """Obtiene en paralelo el precio de cada ticker distinto de una lista de activos.
+
+    Primero lee en una sola consulta las cotizaciones compartidas de price_cache; solo
+    los tickers sin cotización fresca se piden a Yahoo. La concurrencia está limitada por
+    PRICE_FETCH_CONCURRENCY y el conjunto completo por un deadline; los tickers que no
+    responden a tiempo quedan con precio None.
+    """
+    deadline = PRICE_FETCH_DEADLINE if deadline is None else deadline
+    started = time.monotonic()
+    semaphore = asyncio.Semaphore(PRICE_FETCH_CONCURRENCY)
+    
+    # Una sola lectura de price_cache para todos los símbolos que no están en memoria;
+    # los que quedan sin cotización fresca se piden a Yahoo abajo. Cuenta dentro del deadline.
+    symbols = {get_yahoo_ticker(*asset_price_key(a)) for a in assets}
+    try:
+        await asyncio.wait_for(
+            read_shared_prices({symbol for symbol in symbols if symbol not in price_cache}), timeout=deadline
+        )
+    except asyncio.TimeoutError:
+        logging.warning(f"Shared price cache read exceeded the {deadline}s deadline")
+    except httpx.HTTPError as e:
+        logging.warning(f"Shared price cache unavailable: {e}")
+
+    async def fetch(key: tuple) -> Optional[float]:
+        async with semaphore:
+            return await get_current_price(*key, shared=False)
+
+    tasks = {key: asyncio.create_task(fetch(key)) for key in {asset_price_key(a) for a in assets}}
+    if not tasks:
+        return {}
+
+    done, pending = await asyncio.wait(tasks.values(), timeout=max(deadline - (time.monotonic() - started), 0))
+    for task in pending:
+        task.cancel()
+    if pending:
+        logging.warning(f"Price fan-out deadline ({deadline}s) reached, {len(pending)} of {len(tasks)} tickers pending")
+
+    prices = {}
+    for key, task in tasks.items():
+        if task in done and task.exception() is None:
+            prices[key] = task.result()
+        else:
+            if task in done:
+                logging.error(f"Price fetch failed for {key[0]}: {task.exception()}")
+            prices[key] = None
+    return prices
+
+def save_price_history(ticker: str, price: float):
+    """Encola la fila de price_history; el buffer la escribe en lote en segundo plano"""
     price_doc = {
         "id": str(uuid.uuid4()),
         "ticker": ticker,
         "price": price,
         "timestamp": datetime.now(timezone.utc).isoformat()
     }
-    supabase_post("price_history", price_doc)
+    price_history_buffer.add(price_doc)
 
 def get_alert_type_name(alert_type: str) -> str:
     """Convierte el tipo de alerta a un nombre legible"""
@@ -331,10 +1149,10 @@ def get_alert_type_name(alert_type: str) -> str:
     }
     return names.get(alert_type, alert_type)
 
-async def save_notification(user_id: str, ticker: str, alert_type: str, current_price: float, message: str):
-    """Guarda una notificación in-app para el usuario"""
-    notification_doc = {
-        "id": str(uuid.uuid4()),
+def build_notification_doc(user_id: str, ticker: str, alert_type: str, current_price: float, message: str,
+                           notification_id: str = None) -> dict:
+    return {
+        "id": notification_id or str(uuid.uuid4()),
         "user_id": user_id,
         "title": f"🔔 {get_alert_type_name(alert_type)}: {ticker}",
         "message": message,
@@ -344,97 +1162,379 @@ async def save_notification(user_id: str, ticker: str, alert_type: str, current_
         "is_read": False,
         "created_at": datetime.now(timezone.utc).isoformat()
     }
+
+def adjust_unread_count(user_id: str, delta: int):
+    """Actualiza el contador en memoria de no leídas, si ya estaba cacheado (sin extender su TTL)"""
+    count = unread_counts.peek(user_id)
+    if count is not None:
+        unread_counts.replace(user_id, max(count + delta, 0))
+
+async def save_notification(user_id: str, ticker: str, alert_type: str, current_price: float, message: str):
+    """Guarda una notificación in-app para el usuario"""
+    notification_doc = build_notification_doc(user_id, ticker, alert_type, current_price, message)
     
-    result = supabase_post("notifications", notification_doc)
+    result = await supabase_post("notifications", notification_doc)
     if result:
+        adjust_unread_count(user_id, 1)
         logging.info(f"Notification saved for user {user_id}: {ticker} - {alert_type}")
     else:
         logging.error(f"Failed to save notification for user {user_id}")
     return result
 
-async def check_prices_and_alerts():
-    logging.info("Starting price check and alert evaluation")
-    try:
-        # Get all assets
-        assets = supabase_get("assets", {})
+async def write_with_retry(description: str, write):
+    """Ejecuta una escritura a Supabase reintentando con backoff exponencial.
+
+    write devuelve False o None cuando falla; se devuelve el resultado del intento que
+    funcionó (True o las filas afectadas), o None si se agotaron los reintentos.
+    """
+    for attempt in range(ALERT_WRITE_RETRIES + 1):
+        try:
+            result = await write()
+            if result is not None and result is not False:
+                return result
+            logging.warning(f"{description} failed (attempt {attempt + 1})")
+        except httpx.HTTPError as e:
+            logging.warning(f"{description} failed (attempt {attempt + 1}): {e}")
+        if attempt < ALERT_WRITE_RETRIES:
+            await asyncio.sleep(ALERT_WRITE_RETRY_DELAY * 2 ** attempt)
+    logging.error(f"{description} failed after {ALERT_WRITE_RETRIES + 1} attempts")
+    return None
+
+def alert_trigger_id(kind: str, alert: dict) -> str:
+    """Id determinístico de la fila de historial o notificación de un disparo.
+
+    Sale del id de la alerta y de la versión con la que se activó (updated_at): los
+    reintentos del mismo disparo reusan el id y una alerta reactivada genera filas nuevas.
+    """
+    version = alert.get('updated_at') or alert.get('created_at') or ''
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{kind}:{alert['id']}:{version}"))
+
+async def flush_triggered_alerts(triggers: list) -> set:
+    """Guarda en lote las alertas disparadas en una corrida del scheduler.
+
+    Por cada lote:
+        1. inserta el historial con un insert multi-fila en alert_history;
+        2. si quedó guardado, reclama las alertas con PATCH id=in.(...)&is_active=eq.true
+           (de a IN_FILTER_MAX_VALUES ids); solo vuelven las filas que este proceso pasó
+           a inactivas, así una alerta desactivada por otro camino no se notifica dos veces;
+        3. inserta las notificaciones de las alertas reclamadas.
+    Los ids de historial y notificación salen de alert_trigger_id, así que reintentar un
+    lote ignora las filas ya escritas en vez de duplicarlas.
+
+    Devuelve los ids de las alertas resueltas (reclamadas o que ya no estaban activas);
+    las de un lote que falló siguen activas y se reevalúan en la próxima corrida.
+    """
+    settled = set()
+    for start in range(0, len(triggers), ALERT_WRITE_BATCH_SIZE):
+        batch = triggers[start:start + ALERT_WRITE_BATCH_SIZE]
+        sent_at = datetime.now(timezone.utc).isoformat()
+        history = [
+            {
+                "id": alert_trigger_id("alert_history", alert),
+                "user_id": alert['user_id'],
+                "asset_id": alert['asset_id'],
+                "ticker": ticker,
+                "alert_type": alert['alert_type'],
+                "current_price": price,
+                "message": message,
+                "sent_at": sent_at,
+            }
+            for alert, ticker, price, message in batch
+        ]
+        if not await write_with_retry(
+            f"Insert of {len(history)} alert_history rows",
+            lambda: supabase_insert_many("alert_history", history, ignore_duplicates=True),
+        ):
+            continue
         
-        # Group assets by ticker to avoid duplicate API calls
-        checked_tickers = {}
+        alert_ids = [alert['id'] for alert, _, _, _ in batch]
+        claimed = set()
+        for chunk_start in range(0, len(alert_ids), IN_FILTER_MAX_VALUES):
+            chunk = alert_ids[chunk_start:chunk_start + IN_FILTER_MAX_VALUES]
+            rows = await write_with_retry(
+                f"Deactivation of {len(chunk)} alerts",
+                lambda: supabase_update_in("alerts", "id", chunk, {"is_active": False}, {"is_active": "eq.true"}),
+            )
+            if rows is not None:
+                claimed.update(row['id'] for row in rows)
+                settled.update(chunk)
         
-        for asset in assets:
-            ticker = asset['ticker']
-            market = asset.get('market', 'NYSE')
-            asset_type = asset.get('asset_type', 'CEDEAR')
-            ticker_key = f"{ticker}_{market}_{asset_type}"
-            
-            if ticker_key not in checked_tickers:
-                price = await get_current_price(ticker, market, asset_type)
-                checked_tickers[ticker_key] = price
-                if price:
-                    await save_price_history(ticker, price)
+        notifications = [
+            build_notification_doc(
+                alert['user_id'], ticker, alert['alert_type'], price, message,
+                notification_id=alert_trigger_id("notification", alert),
+            )
+            for alert, ticker, price, message in batch
+            if alert['id'] in claimed
+        ]
+        # Si este insert se agota la alerta ya quedó desactivada: se pierde el aviso in-app
+        # (queda el historial) en vez de arriesgar notificar dos veces
+        if notifications and await write_with_retry(
+            f"Insert of {len(notifications)} notifications",
+            lambda: supabase_insert_many("notifications", notifications, ignore_duplicates=True),
+        ):
+            logging.info(f"Saved {len(notifications)} alert notifications")
+            for notification in notifications:
+                adjust_unread_count(notification['user_id'], 1)
+    return settled
+
+# Índice en memoria de las alertas activas. Lo mantiene solo el worker que corre el
+# scheduler: la primera corrida lo carga completo y las siguientes traen de la base las
+# alertas y activos modificados desde la anterior (incluye lo que cambiaron las rutas de
+# otros workers). Las rutas de /api/alerts y /api/assets de este worker lo actualizan al
+# instante. Al perder el liderazgo se descarta y se vuelve a cargar si se recupera.
+alert_index = AlertIndex()
+alert_index_synced_at: Optional[datetime] = None
+alert_index_reload_at = 0.0
+ALERT_INDEX_SELECT = "*,assets(ticker,market,asset_type,avg_purchase_price)"
+# updated_at es la hora de inicio de la transacción: las que seguían abiertas al
+# sincronizar se levantan en la corrida siguiente gracias a este solapamiento
+ALERT_INDEX_SYNC_OVERLAP = timedelta(seconds=60)
+
+def alert_index_live() -> bool:
+    """True si este worker mantiene el índice de alertas (ya lo cargó como líder)"""
+    return alert_index_synced_at is not None
+
+def reset_alert_index():
+    """Descarta el índice (se llama al perder el liderazgo del scheduler)"""
+    global alert_index, alert_index_synced_at
+    alert_index = AlertIndex()
+    alert_index_synced_at = None
+
+async def reload_alert_index() -> AlertIndex:
+    """Carga todas las alertas activas (con el precio promedio de su activo) página por página"""
+    global alert_index
+    rows = []
+    async for a in supabase_iter("alerts", {"select": ALERT_INDEX_SELECT, "is_active": "eq.true"}):
+        if a.get('assets'):
+            rows.append((asset_price_key(a['assets']), a))
+    index = AlertIndex()
+    index.add_many(rows)
+    alert_index = index
+    return index
+
+async def sync_alert_index() -> AlertIndex:
+    """Pone al día el índice con los cambios de la base desde la sincronización anterior.
+
+    Las alertas modificadas se agregan o quitan según sigan activas y los activos
+    modificados recalculan los umbrales de sus alertas. Los borrados no dejan rastro en
+    updated_at: los suelta la recarga completa periódica (mientras tanto, reclamar una
+    alerta borrada no cambia ninguna fila, así que no se notifica).
+    """
+    global alert_index_synced_at, alert_index_reload_at
+    started = datetime.now(timezone.utc)
+    if alert_index_synced_at is None or time.monotonic() >= alert_index_reload_at:
+        index = await reload_alert_index()
+        alert_index_reload_at = time.monotonic() + ALERT_INDEX_RELOAD_MINUTES * 60
+    else:
+        index = alert_index
+        since = {"updated_at": f"gte.{(alert_index_synced_at - ALERT_INDEX_SYNC_OVERLAP).isoformat()}"}
+        active, inactive = [], []
+        async for a in supabase_iter("alerts", {"select": ALERT_INDEX_SELECT, **since}):
+            if a['is_active'] and a.get('assets'):
+                active.append((asset_price_key(a['assets']), a))
             else:
-                price = checked_tickers[ticker_key]
+                inactive.append(a['id'])
+        index.remove_many(inactive)
+        index.add_many(active)
+        async for a in supabase_iter("assets", {"select": "id,ticker,market,asset_type,avg_purchase_price", **since}):
+            index.reprice_asset(a['id'], asset_price_key(a), a['avg_purchase_price'])
+    if leader_election is not None and not leader_election.is_leader:
+        # Se perdió el liderazgo mientras se cargaba: el índice no queda vivo en este worker
+        reset_alert_index()
+    else:
+        alert_index_synced_at = started
+    return index
+
+async def check_prices_and_alerts(markets: set = None) -> bool:
+    """Consulta precios, evalúa alertas y actualiza snapshots.
+
+    markets limita la corrida a los activos de esos mercados (ver market_hours);
+    sin markets se consultan todos. Devuelve False si la corrida falló o no consiguió
+    ninguna cotización (p.ej. Yahoo caído), así el llamador puede reintentarla.
+    """
+    logging.info(f"Starting price check and alert evaluation (markets={sorted(markets) if markets else 'all'})")
+    try:
+        async def refresh_due_prices() -> dict:
+            # Solo hacen falta las claves distintas de precio, no los activos completos
+            keys = set()
+            async for a in supabase_iter("assets", {"select": "id,ticker,market,asset_type"}):
+                key = asset_price_key(a)
+                if markets is None or market_for_symbol(get_yahoo_ticker(*key)) in markets:
+                    keys.add(key)
+            return await refresh_current_prices(keys)
+        
+        # El índice de alertas se pone al día en paralelo con los precios (pedidos a Yahoo en lotes)
+        index, checked_tickers = await asyncio.gather(
+            sync_alert_index(),
+            refresh_due_prices(),
+        )
+        if not checked_tickers:
+            # Mercado pendiente sin activos: no hay nada que evaluar ni snapshots que tocar
+            logging.info("No assets in the due markets, nothing to check")
+            return True
+        if not any(checked_tickers.values()):
+            logging.warning(f"No quotes obtained for {len(checked_tickers)} tickers, skipping run")
+            return False
+        logging.info(f"Evaluating {len(index)} active alerts over {len(checked_tickers)} tickers")
+        triggers = []
+        
+        for ticker_key, price in checked_tickers.items():
+            if not price:
+                continue
+            ticker = ticker_key[0]
+            save_price_history(ticker, price)
             
-            if price:
-                # Check alerts for this asset
-                alerts = supabase_get("alerts", {"asset_id": f"eq.{asset['id']}", "is_active": "eq.true"})
-                
-                for alert in alerts:
-                    should_trigger = False
-                    message = ""
-                    
-                    if alert['is_percentage']:
-                        threshold = float(asset['avg_purchase_price']) * (1 + float(alert['target_value']) / 100)
-                    else:
-                        threshold = float(alert['target_value'])
-                    
-                    if alert['alert_type'] == 'target_buy' and price <= threshold:
-                        should_trigger = True
-                        message = f"El precio ha alcanzado tu objetivo de compra: ${price:.2f}"
-                    elif alert['alert_type'] == 'target_sell' and price >= threshold:
-                        should_trigger = True
-                        message = f"El precio ha alcanzado tu objetivo de venta: ${price:.2f}"
-                    elif alert['alert_type'] == 'stop_loss' and price <= threshold:
-                        should_trigger = True
-                        message = f"¡STOP LOSS activado! Precio actual: ${price:.2f}"
-                    elif alert['alert_type'] == 'take_profit' and price >= threshold:
-                        should_trigger = True
-                        message = f"¡TAKE PROFIT alcanzado! Precio actual: ${price:.2f}"
-                    
-                    if should_trigger:
-                        # Save in-app notification
-                        await save_notification(
-                            alert['user_id'],
-                            ticker,
-                            alert['alert_type'],
-                            price,
-                            message
-                        )
-                        
-                        # Save to history
-                        history_doc = {
-                            "id": str(uuid.uuid4()),
-                            "user_id": alert['user_id'],
-                            "asset_id": asset['id'],
-                            "ticker": ticker,
-                            "alert_type": alert['alert_type'],
-                            "current_price": price,
-                            "message": message,
-                            "sent_at": datetime.now(timezone.utc).isoformat()
-                        }
-                        supabase_post("alert_history", history_doc)
-                        
-                        # Deactivate alert
-                        supabase_patch("alerts", {"id": alert['id']}, {"is_active": False})
+            for alert, message in index.evaluate(ticker_key, price):
+                triggers.append((alert, ticker, price, message))
+        
+        if triggers:
+            settled = await flush_triggered_alerts(triggers)
+            index.remove_many(settled)
+            logging.info(f"{len(triggers)} alerts triggered, {len(settled)} settled")
+        
+        # Los snapshots valúan las posiciones de mercados cerrados con su último precio conocido
+        await save_portfolio_snapshots(checked_tickers)
                                 
         logging.info("Price check and alert evaluation completed")
+        return True
     except Exception as e:
         logging.error(f"Error in check_prices_and_alerts: {e}")
+        return False
+
+async def run_scheduled_price_check():
+    """Tick del scheduler: consulta solo los mercados que la política de horarios marca como pendientes"""
+    now = datetime.now(timezone.utc)
+    markets = polling_policy.due_markets(now)
+    if not markets:
+        return
+    # Si falló no se marca: el próximo tick vuelve a intentarlo (importa sobre todo para
+    # la consulta única de cierre)
+    if await check_prices_and_alerts(markets):
+        polling_policy.mark_polled(markets, now)
+
+async def sync_shared_prices():
+    """Lleva al stream del portafolio las cotizaciones que el líder escribió en price_cache.
+
+    Corre en todos los workers; solo consulta la tabla en los que no son líderes del
+    scheduler (el líder ya publica al refrescar) y tienen streams abiertos.
+    """
+    since = datetime.now(timezone.utc)
+    while True:
+        await asyncio.sleep(SHARED_PRICE_SYNC_SECONDS)
+        keys = portfolio_broker.keys()
+        if leader_election is None or leader_election.is_leader or not keys:
+            since = datetime.now(timezone.utc)
+            continue
+        keys_by_symbol = {}
+        for key in keys:
+            keys_by_symbol.setdefault(get_yahoo_ticker(*key), []).append(key)
+        try:
+            quotes = await read_shared_prices(set(keys_by_symbol), since=since)
+        except Exception as e:
+            logging.error(f"Error syncing shared prices: {e}")
+            continue
+        for symbol, (price, updated_at) in quotes.items():
+            for key in keys_by_symbol[symbol]:
+                portfolio_broker.publish(key, price)
+                last_quotes[key] = price
+            since = max(since, updated_at)
+
+async def rollup_watermark(tier: str) -> Optional[datetime]:
+    """Inicio de la vela más reciente del nivel (hasta ahí ya está compactado)"""
+    result = await supabase_get("price_rollups", {
+        "select": "bucket_start",
+        "resolution": f"eq.{tier}",
+        "order": "bucket_start.desc",
+        "limit": "1",
+    })
+    return parse_timestamp(result[0]['bucket_start']) if result else None
+
+async def first_timestamp(table: str, column: str, params: dict, since: Optional[datetime]) -> Optional[datetime]:
+    """Primer valor de column (>= since) entre las filas que cumplen params"""
+    params = {**params, "select": column, "order": column, "limit": "1"}
+    if since:
+        params[column] = f"gte.{since.isoformat()}"
+    result = await supabase_get(table, params)
+    return parse_timestamp(result[0][column]) if result else None
+
+async def rollup_tier(tier: str, finer: Optional[str]) -> int:
+    """Recalcula las velas del nivel desde su última vela, de a un tramo de ROLLUP_WINDOWS.
+
+    Cada tramo se lee página por página (supabase_iter) en un BarAggregator y sus velas se
+    guardan antes de pasar al siguiente, así la memoria queda acotada a un tramo y si la
+    corrida se corta la próxima retoma desde la última vela escrita. Los tramos sin datos
+    se saltean hasta la próxima fila. Devuelve la cantidad de velas escritas.
+    """
+    if finer is None:
+        table, column, params = "price_history", "timestamp", {"select": "id,ticker,price,timestamp"}
+    else:
+        table, column, params = "price_rollups", "bucket_start", {
+            "select": "id,ticker,bucket_start,open,high,low,close,samples",
+            "resolution": f"eq.{finer}",
+        }
+    width, window = TIERS[tier], ROLLUP_WINDOWS[tier]
+    now = datetime.now(timezone.utc)
+    written = 0
+    start = await first_timestamp(table, column, params, await rollup_watermark(tier))
+    while start is not None and start <= now:
+        start = bucket_start(start, width)
+        end = start + window
+        aggregator = BarAggregator(tier)
+        async for row in supabase_iter(table, {**params, "and": between(column, start.isoformat(), end.isoformat())},
+                                       order=(column, "id")):
+            if finer is None:
+                aggregator.add_tick(row)
+            else:
+                aggregator.add_bar(row)
+        bars = aggregator.bars()
+        for chunk in range(0, len(bars), SUPABASE_PAGE_SIZE):
+            if not await supabase_upsert_many(
+                "price_rollups", bars[chunk:chunk + SUPABASE_PAGE_SIZE],
+                on_conflict="ticker,resolution,bucket_start",
+            ):
+                raise RuntimeError(f"could not write {tier} rollups from {start.isoformat()}")
+        written += len(bars)
+        start = await first_timestamp(table, column, params, end)
+    return written
+
+async def rollup_price_history():
+    """Compacta price_history en velas OHLC de 1h, 1d y 1w y aplica la retención de cada nivel.
+
+    Es incremental: cada nivel se recalcula desde el inicio de su última vela (que puede
+    haber quedado incompleta) usando el nivel anterior (ver rollup_tier). Los datos finos
+    solo se borran si ya están cubiertos por el nivel siguiente.
+    """
+    logging.info("Starting price_history rollup")
+    try:
+        finer = None
+        watermarks = {}
+        for tier in TIERS:
+            written = await rollup_tier(tier, finer)
+            watermarks[tier] = await rollup_watermark(tier)
+            logging.info(f"Rolled up {written} {tier} bars")
+            finer = tier
+        
+        # Retención: solo se borra lo que el nivel siguiente ya compactó
+        now = datetime.now(timezone.utc)
+        if watermarks["1h"]:
+            cutoff = min(now - timedelta(days=PRICE_HISTORY_RAW_RETENTION_DAYS), watermarks["1h"])
+            await supabase_delete_where("price_history", {"timestamp": f"lt.{cutoff.isoformat()}"})
+        for tier, coarser, days in (("1h", "1d", PRICE_ROLLUP_1H_RETENTION_DAYS), ("1d", "1w", PRICE_ROLLUP_1D_RETENTION_DAYS)):
+            if watermarks[coarser]:
+                cutoff = min(now - timedelta(days=days), watermarks[coarser])
+                await supabase_delete_where("price_rollups", {
+                    "resolution": f"eq.{tier}",
+                    "bucket_start": f"lt.{cutoff.isoformat()}",
+                })
+        logging.info("price_history rollup completed")
+    except Exception as e:
+        logging.error(f"Error in rollup_price_history: {e}")
 
 # Auth routes
 @api_router.post("/auth/register")
 async def register(user_data: UserRegister):
-    result = supabase_get("users", {"email": f"eq.{user_data.email}"})
+    result = await supabase_get("users", {"email": f"eq.{user_data.email}"})
     if result:
         raise HTTPException(status_code=400, detail="Email already registered")
     
@@ -442,11 +1542,11 @@ async def register(user_data: UserRegister):
     user_doc = {
         "id": user_id,
         "email": user_data.email,
-        "password_hash": hash_password(user_data.password),
+        "password_hash": await password_hasher.hash(user_data.password),
         "name": user_data.name,
     }
     
-    supabase_post("users", user_doc)
+    await supabase_post("users", user_doc)
     token = create_token(user_id)
     
     return {
@@ -460,9 +1560,9 @@ async def register(user_data: UserRegister):
 
 @api_router.post("/auth/login")
 async def login(credentials: UserLogin):
-    result = supabase_get("users", {"email": f"eq.{credentials.email}"})
+    result = await supabase_get("users", {"email": f"eq.{credentials.email}"})
     user = result[0] if result else None
-    if not user or not verify_password(credentials.password, user['password_hash']):
+    if not user or not await password_hasher.verify(credentials.password, user['password_hash']):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     token = create_token(user['id'])
@@ -478,8 +1578,11 @@ async def login(credentials: UserLogin):
 
 @api_router.get("/auth/me")
 async def get_me(user_id: str = Depends(get_current_user)):
-    result = supabase_get("users", {"id": f"eq.{user_id}", "select": "id,email,name,created_at"})
-    user = result[0] if result else None
+    async def load_user():
+        result = await supabase_get("users", {"id": f"eq.{user_id}", "select": "id,email,name,created_at"})
+        return result[0] if result else None
+    
+    user = await user_profile_cache.get_or_load(user_id, load_user)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return {"user_id": user['id'], "email": user['email'], "name": user['name'], "created_at": user.get('created_at', '')}
@@ -494,135 +1597,196 @@ async def create_asset(asset_data: AssetCreate, user_id: str = Depends(get_curre
         **asset_data.model_dump(),
     }
     
-    supabase_post("assets", asset_doc)
+    await supabase_post("assets", asset_doc)
+    await invalidate_portfolio_snapshot(user_id)
     return Asset(asset_id=asset_id, user_id=user_id, created_at=datetime.now(timezone.utc).isoformat(), **asset_data.model_dump())
 
 @api_router.get("/assets", response_model=List[Asset])
-async def get_assets(user_id: str = Depends(get_current_user)):
-    result = supabase_get("assets", {"user_id": f"eq.{user_id}"})
-    assets = []
-    for a in result:
-        assets.append(Asset(asset_id=a['id'], user_id=a['user_id'], asset_type=a['asset_type'], 
-                           ticker=a['ticker'], quantity=a['quantity'], avg_purchase_price=a['avg_purchase_price'],
-                           purchase_date=a['purchase_date'], market=a['market'], created_at=a.get('created_at', '')))
-    return assets
+async def get_assets(cursor: Optional[str] = None, limit: int = Query(100, ge=1, le=API_PAGE_MAX_LIMIT),
+                     user_id: str = Depends(get_current_user)):
+    """Activos del usuario por orden de alta, de a `limit`; la página siguiente se pide con
+    el cursor del header X-Next-Cursor"""
+    result, next_cursor = await supabase_page(
+        "assets", {"user_id": f"eq.{user_id}"}, ("created_at", "id"), False, limit, cursor
+    )
+    return with_next_cursor(assets_json.response(result), next_cursor)
 
 @api_router.get("/assets/{asset_id}", response_model=Asset)
 async def get_asset(asset_id: str, user_id: str = Depends(get_current_user)):
-    result = supabase_get("assets", {"id": f"eq.{asset_id}", "user_id": f"eq.{user_id}"})
+    result = await supabase_get("assets", {"id": f"eq.{asset_id}", "user_id": f"eq.{user_id}"})
     if not result:
         raise HTTPException(status_code=404, detail="Asset not found")
     a = result[0]
-    return Asset(asset_id=a['id'], user_id=a['user_id'], asset_type=a['asset_type'], 
-                ticker=a['ticker'], quantity=a['quantity'], avg_purchase_price=a['avg_purchase_price'],
-                purchase_date=a['purchase_date'], market=a['market'], created_at=a.get('created_at', ''))
+    return Asset.model_validate(a)
 
 @api_router.put("/assets/{asset_id}", response_model=Asset)
 async def update_asset(asset_id: str, update_data: AssetUpdate, user_id: str = Depends(get_current_user)):
-    result = supabase_get("assets", {"id": f"eq.{asset_id}", "user_id": f"eq.{user_id}"})
-    if not result:
-        raise HTTPException(status_code=404, detail="Asset not found")
-    
+    match = {"id": asset_id, "user_id": user_id}
     update_dict = {k: v for k, v in update_data.model_dump().items() if v is not None}
     if update_dict:
-        supabase_patch("assets", {"id": asset_id}, update_dict)
+        result = await supabase_update("assets", match, update_dict)
+    else:
+        result = await supabase_get("assets", {k: f"eq.{v}" for k, v in match.items()})
+    if not result:
+        raise HTTPException(status_code=404, detail="Asset not found")
     
-    result = supabase_get("assets", {"id": f"eq.{asset_id}"})
     a = result[0]
-    return Asset(asset_id=a['id'], user_id=a['user_id'], asset_type=a['asset_type'], 
-                ticker=a['ticker'], quantity=a['quantity'], avg_purchase_price=a['avg_purchase_price'],
-                purchase_date=a['purchase_date'], market=a['market'], created_at=a.get('created_at', ''))
+    if alert_index_live():
+        alert_index.reprice_asset(asset_id, asset_price_key(a), a['avg_purchase_price'])
+    await invalidate_portfolio_snapshot(user_id)
+    return Asset.model_validate(a)
 
 @api_router.delete("/assets/{asset_id}")
 async def delete_asset(asset_id: str, user_id: str = Depends(get_current_user)):
-    result = supabase_get("assets", {"id": f"eq.{asset_id}", "user_id": f"eq.{user_id}"})
-    if not result:
+    # alerts.asset_id es ON DELETE CASCADE: las alertas del activo se borran en la misma operación
+    if not await supabase_remove("assets", {"id": asset_id, "user_id": user_id}):
         raise HTTPException(status_code=404, detail="Asset not found")
     
-    supabase_delete("assets", {"id": asset_id})
-    supabase_delete("alerts", {"asset_id": asset_id})
+    if alert_index_live():
+        alert_index.remove_asset(asset_id)
+    await invalidate_portfolio_snapshot(user_id)
     
     return {"message": "Asset deleted successfully"}
 
 # Portfolio routes
-@api_router.get("/portfolio/summary", response_model=PortfolioSummary)
-async def get_portfolio_summary(user_id: str = Depends(get_current_user)):
-    assets = supabase_get("assets", {"user_id": f"eq.{user_id}"})
-    
-    total_investment = 0
-    current_value = 0
-    
-    for asset in assets:
-        investment = float(asset['quantity']) * float(asset['avg_purchase_price'])
-        total_investment += investment
-        
-        price = await get_current_price(asset['ticker'], asset.get('market', 'NYSE'), asset.get('asset_type', 'CEDEAR'))
-        if price:
-            current_value += float(asset['quantity']) * price
-        else:
-            current_value += investment
-    
-    gain_loss = current_value - total_investment
-    gain_loss_pct = (gain_loss / total_investment * 100) if total_investment > 0 else 0
-    
-    return PortfolioSummary(
-        total_investment=total_investment,
-        current_value=current_value,
-        total_gain_loss=gain_loss,
-        total_gain_loss_pct=gain_loss_pct,
-        assets_count=len(assets)
+async def fresh_portfolio_summary(user_id: str) -> Optional[PortfolioSummary]:
+    """Resumen desde el snapshot guardado, o None si no sirve.
+
+    No sirve si no hay, si tiene más de PORTFOLIO_SNAPSHOT_MAX_AGE, si se calculó antes
+    de la última modificación de un activo del usuario (updated_at) o si la cantidad de
+    activos no coincide (se borró alguno).
+    """
+    result, assets = await asyncio.gather(
+        supabase_get("portfolio_snapshots", {
+            "user_id": f"eq.{user_id}",
+            "select": "total_investment,current_value,total_gain_loss,total_gain_loss_pct,assets_count,computed_at",
+        }),
+        supabase_get("assets", {"user_id": f"eq.{user_id}", "select": "updated_at"}),
     )
+    if not result:
+        return None
+    snapshot = result[0]
+    computed_at = parse_timestamp(snapshot['computed_at'])
+    age = (datetime.now(timezone.utc) - computed_at).total_seconds()
+    if age > PORTFOLIO_SNAPSHOT_MAX_AGE or snapshot['assets_count'] != len(assets):
+        return None
+    if any(a.get('updated_at') and parse_timestamp(a['updated_at']) > computed_at for a in assets):
+        return None
+    return PortfolioSummary(**snapshot, snapshot_age_seconds=max(age, 0))
 
-@api_router.get("/portfolio/assets", response_model=List[AssetWithPrice])
-async def get_assets_with_prices(user_id: str = Depends(get_current_user)):
-    assets = supabase_get("assets", {"user_id": f"eq.{user_id}"})
-    response = []
+@api_router.get("/portfolio/summary", response_model=PortfolioSummary)
+async def get_portfolio_summary(live: bool = False, user_id: str = Depends(get_current_user)):
+    """Resumen del portafolio leído del snapshot que calcula el scheduler.
+
+    Con live=true (o si no hay snapshot o es más viejo que PORTFOLIO_SNAPSHOT_MAX_AGE)
+    se recalcula con precios actuales y se guarda como snapshot nuevo.
+    """
+    if not live:
+        summary = await fresh_portfolio_summary(user_id)
+        if summary is not None:
+            return summary
+    
+    as_of = datetime.now(timezone.utc)
+    assets = await supabase_get("assets", {"user_id": f"eq.{user_id}"})
+    prices = await get_prices_for_assets(assets)
+    snapshot = compute_portfolio_snapshot(user_id, assets, prices, as_of)
+    spawn(supabase_upsert_many("portfolio_snapshots", [snapshot], on_conflict="user_id"))
+    return PortfolioSummary(**snapshot, snapshot_age_seconds=0)
+
+def asset_price_rows(assets: list, prices: dict) -> list:
+    """Filas de /api/portfolio/assets: cada activo con su valuación y una recomendación simple"""
+    rows = []
     
     for a in assets:
-        asset = Asset(asset_id=a['id'], user_id=a['user_id'], asset_type=a['asset_type'], 
-                     ticker=a['ticker'], quantity=a['quantity'], avg_purchase_price=a['avg_purchase_price'],
-                     purchase_date=a['purchase_date'], market=a['market'], created_at=a.get('created_at', ''))
-        price = await get_current_price(asset.ticker, asset.market, asset.asset_type)
+        price = prices.get(asset_price_key(a))
+        values = position_values(float(a['quantity']), float(a['avg_purchase_price']), price)
         
         if price:
-            current_value = float(asset.quantity) * price
-            investment = float(asset.quantity) * float(asset.avg_purchase_price)
-            gain_loss = current_value - investment
-            gain_loss_pct = (gain_loss / investment * 100) if investment > 0 else 0
-            
             # Simple recommendation logic
-            if gain_loss_pct > 20:
+            if values["gain_loss_pct"] > 20:
                 recommendation = "Considerar venta (ganancia >20%)"
-            elif gain_loss_pct < -10:
+            elif values["gain_loss_pct"] < -10:
                 recommendation = "Revisar posición (pérdida >10%)"
             else:
                 recommendation = "Mantener"
             
-            response.append(AssetWithPrice(
-                asset=asset,
-                current_price=price,
-                current_value=current_value,
-                gain_loss=gain_loss,
-                gain_loss_pct=gain_loss_pct,
-                recommendation=recommendation
-            ))
+            rows.append({"asset": a, **values, "recommendation": recommendation})
         else:
-            response.append(AssetWithPrice(
-                asset=asset,
-                current_price=None,
-                current_value=None,
-                gain_loss=None,
-                gain_loss_pct=None,
-                recommendation="Precio no disponible"
-            ))
+            rows.append({"asset": a, **values, "recommendation": "Precio no disponible"})
     
-    return response
+    return rows
+
+@api_router.get("/portfolio/assets", response_model=List[AssetWithPrice])
+async def get_assets_with_prices(user_id: str = Depends(get_current_user)):
+    assets = await supabase_get("assets", {"user_id": f"eq.{user_id}"})
+    prices = await get_prices_for_assets(assets)
+    return assets_with_price_json.response(asset_price_rows(assets, prices))
+
+@api_router.get("/dashboard", response_model=Dashboard)
+async def get_dashboard(user_id: str = Depends(get_current_user)):
+    """Resumen, activos con recomendación y estado de notificaciones en una sola respuesta.
+
+    Los activos se leen una vez y cada ticker se cotiza una vez; el resumen y las filas
+    por activo salen de esos mismos precios, así nunca se contradicen. La primera página
+    de notificaciones y el contador de no leídas se consultan en paralelo con los precios.
+    """
+    async def priced_assets():
+        assets = await supabase_get("assets", {"user_id": f"eq.{user_id}"})
+        return assets, await get_prices_for_assets(assets)
+    
+    (assets, prices), notifications, unread = await asyncio.gather(
+        priced_assets(),
+        supabase_get("notifications", {"user_id": f"eq.{user_id}", "order": "created_at.desc,id.desc", "limit": "50"}),
+        count_unread_notifications(user_id),
+    )
+    
+    snapshot = compute_portfolio_snapshot(user_id, assets, prices)
+    dashboard = Dashboard.model_validate({
+        "summary": {**snapshot, "snapshot_age_seconds": 0},
+        "assets": asset_price_rows(assets, prices),
+        "notifications": notifications,
+        "unread_count": unread,
+    })
+    return Response(content=dashboard.model_dump_json(), media_type="application/json")
+
+@api_router.get("/portfolio/stream")
+async def stream_portfolio(request: Request, user_id: str = Depends(get_stream_user)):
+    """Stream SSE de la valuación del portafolio.
+
+    Envía un evento `snapshot` con todas las posiciones y después un evento `delta` con las
+    posiciones que cambiaron cada vez que el scheduler publica un precio nuevo.
+    """
+    assets = await supabase_get("assets", {"user_id": f"eq.{user_id}"})
+    prices = await get_prices_for_assets(assets)
+    subscriber = PortfolioSubscriber(user_id, [(asset_price_key(a), a) for a in assets], prices)
+    
+    def sse(event: str, data: dict) -> str:
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    
+    async def events():
+        portfolio_broker.subscribe(subscriber)
+        try:
+            yield sse("snapshot", subscriber.snapshot())
+            while not await request.is_disconnected():
+                delta = await subscriber.next_delta(PORTFOLIO_STREAM_KEEPALIVE)
+                if delta:
+                    yield sse("delta", delta)
+                else:
+                    # Comentario SSE para que proxies y balanceadores no corten la conexión
+                    yield ": keepalive\n\n"
+        finally:
+            portfolio_broker.unsubscribe(subscriber)
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
 
 # Alerts routes
 @api_router.post("/alerts", response_model=Alert)
 async def create_alert(alert_data: AlertCreate, user_id: str = Depends(get_current_user)):
     # Verify asset belongs to user
-    result = supabase_get("assets", {"id": f"eq.{alert_data.asset_id}", "user_id": f"eq.{user_id}"})
+    result = await supabase_get("assets", {"id": f"eq.{alert_data.asset_id}", "user_id": f"eq.{user_id}"})
     if not result:
         raise HTTPException(status_code=404, detail="Asset not found")
     
@@ -637,79 +1801,133 @@ async def create_alert(alert_data: AlertCreate, user_id: str = Depends(get_curre
         "is_active": True,
     }
     
-    supabase_post("alerts", alert_doc)
+    # La fila guardada trae updated_at, la versión que identifica sus disparos
+    created = await supabase_post("alerts", alert_doc) or alert_doc
+    if alert_index_live():
+        alert_index.add(asset_price_key(result[0]), created, result[0]['avg_purchase_price'])
     return Alert(alert_id=alert_id, user_id=user_id, asset_id=alert_data.asset_id, 
                 alert_type=alert_data.alert_type, target_value=alert_data.target_value,
                 is_percentage=alert_data.is_percentage, is_active=True, 
-                created_at=datetime.now(timezone.utc).isoformat())
+                created_at=created.get('created_at') or datetime.now(timezone.utc).isoformat())
 
 @api_router.get("/alerts", response_model=List[Alert])
 async def get_alerts(user_id: str = Depends(get_current_user)):
-    result = supabase_get("alerts", {"user_id": f"eq.{user_id}"})
-    alerts = []
-    for a in result:
-        alerts.append(Alert(alert_id=a['id'], user_id=a['user_id'], asset_id=a['asset_id'],
-                           alert_type=a['alert_type'], target_value=a['target_value'],
-                           is_percentage=a['is_percentage'], is_active=a['is_active'], created_at=a.get('created_at', '')))
-    return alerts
+    result = await supabase_get("alerts", {"user_id": f"eq.{user_id}"})
+    return alerts_json.response(result)
 
 @api_router.get("/alerts/asset/{asset_id}", response_model=List[Alert])
 async def get_alerts_by_asset(asset_id: str, user_id: str = Depends(get_current_user)):
     # Verify asset belongs to user
-    result = supabase_get("assets", {"id": f"eq.{asset_id}", "user_id": f"eq.{user_id}"})
+    result = await supabase_get("assets", {"id": f"eq.{asset_id}", "user_id": f"eq.{user_id}"})
     if not result:
         raise HTTPException(status_code=404, detail="Asset not found")
     
-    result = supabase_get("alerts", {"asset_id": f"eq.{asset_id}"})
-    alerts = []
-    for a in result:
-        alerts.append(Alert(alert_id=a['id'], user_id=a['user_id'], asset_id=a['asset_id'],
-                           alert_type=a['alert_type'], target_value=a['target_value'],
-                           is_percentage=a['is_percentage'], is_active=a['is_active'], created_at=a.get('created_at', '')))
-    return alerts
+    result = await supabase_get("alerts", {"asset_id": f"eq.{asset_id}"})
+    return alerts_json.response(result)
 
 @api_router.put("/alerts/{alert_id}", response_model=Alert)
 async def update_alert(alert_id: str, update_data: AlertUpdate, user_id: str = Depends(get_current_user)):
-    result = supabase_get("alerts", {"id": f"eq.{alert_id}", "user_id": f"eq.{user_id}"})
-    if not result:
-        raise HTTPException(status_code=404, detail="Alert not found")
-    
+    match = {"id": alert_id, "user_id": user_id}
+    select = "*,assets(ticker,market,asset_type,avg_purchase_price)"
     update_dict = {k: v for k, v in update_data.model_dump().items() if v is not None}
     if update_dict:
-        supabase_patch("alerts", {"id": alert_id}, update_dict)
+        result = await supabase_update("alerts", match, update_dict, select=select)
+    else:
+        result = await supabase_get("alerts", {**{k: f"eq.{v}" for k, v in match.items()}, "select": select})
+    if not result:
+        raise HTTPException(status_code=404, detail="Alert not found")
     
-    result = supabase_get("alerts", {"id": f"eq.{alert_id}"})
     a = result[0]
-    return Alert(alert_id=a['id'], user_id=a['user_id'], asset_id=a['asset_id'],
-                alert_type=a['alert_type'], target_value=a['target_value'],
-                is_percentage=a['is_percentage'], is_active=a['is_active'], created_at=a.get('created_at', ''))
+    if alert_index_live():
+        if a['is_active'] and a.get('assets'):
+            alert_index.add(asset_price_key(a['assets']), a)
+        else:
+            alert_index.remove(alert_id)
+    return Alert.model_validate(a)
 
 @api_router.delete("/alerts/{alert_id}")
 async def delete_alert(alert_id: str, user_id: str = Depends(get_current_user)):
-    result = supabase_get("alerts", {"id": f"eq.{alert_id}", "user_id": f"eq.{user_id}"})
-    if not result:
+    if not await supabase_remove("alerts", {"id": alert_id, "user_id": user_id}):
         raise HTTPException(status_code=404, detail="Alert not found")
     
-    supabase_delete("alerts", {"id": alert_id})
+    if alert_index_live():
+        alert_index.remove(alert_id)
     return {"message": "Alert deleted successfully"}
 
 # Alert history routes
 @api_router.get("/alerts/history", response_model=List[AlertHistory])
-async def get_alert_history(user_id: str = Depends(get_current_user)):
-    result = supabase_get("alert_history", {"user_id": f"eq.{user_id}", "order": "sent_at.desc", "limit": "100"})
-    history = []
-    for h in result:
-        history.append(AlertHistory(history_id=h['id'], user_id=h['user_id'], asset_id=h.get('asset_id', ''),
-                                   ticker=h.get('ticker', ''), alert_type=h.get('alert_type', ''), 
-                                   current_price=h.get('current_price', 0),
-                                   message=h.get('message', ''), sent_at=h.get('sent_at', '')))
-    return history
+async def get_alert_history(cursor: Optional[str] = None, limit: int = Query(100, ge=1, le=API_PAGE_MAX_LIMIT),
+                            user_id: str = Depends(get_current_user)):
+    """Alertas disparadas, de la más reciente a la más vieja, paginadas por cursor (X-Next-Cursor)"""
+    result, next_cursor = await supabase_page(
+        "alert_history", {"user_id": f"eq.{user_id}"}, ("sent_at", "id"), True, limit, cursor
+    )
+    return with_next_cursor(alert_history_json.response(result), next_cursor)
 
 # Price history routes
 @api_router.get("/prices/{ticker}")
-async def get_price_history(ticker: str, limit: int = 100):
-    result = supabase_get("price_history", {"ticker": f"eq.{ticker}", "order": "timestamp.desc", "limit": str(limit)})
-    return result
+async def get_price_history(ticker: str, limit: int = Query(100, ge=1, le=API_PAGE_MAX_LIMIT),
+                            cursor: Optional[str] = None, range_: Optional[str] = Query(None, alias="range"),
+                            resolution: Optional[str] = None):
+    """Historial guardado de un ticker.
+
+    Sin range ni resolution devuelve los ticks crudos más recientes de a `limit`; los
+    anteriores se piden con el cursor del header X-Next-Cursor. Con range (p.ej. 5d,
+    3mo, 1y) y resolution (p.ej. 15m, 4h, 1d o auto) devuelve velas OHLC servidas desde el
+    nivel de rollup más grueso que alcanza la resolución pedida. Si ese nivel no conserva
+    todo el rango responde 400 (con auto se elige una resolución cuyo nivel sí lo cubre).
+    """
+    if range_ is None and resolution is None:
+        result, next_cursor = await supabase_page(
+            "price_history", {"ticker": f"eq.{ticker}"}, ("timestamp", "id"), True, limit, cursor
+        )
+        return with_next_cursor(JSONResponse(result), next_cursor)
+    
+    try:
+        span = parse_duration(range_ or "1mo")
+        if resolution in (None, "auto"):
+            width = auto_resolution(span, PRICE_HISTORY_MAX_POINTS, PRICE_HISTORY_RAW_INTERVAL, TIER_RETENTION)
+        else:
+            width = parse_duration(resolution)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if span / width > PRICE_HISTORY_MAX_POINTS:
+        raise HTTPException(status_code=400, detail=f"Too many points (max {PRICE_HISTORY_MAX_POINTS}), use a coarser resolution")
+    
+    since = (datetime.now(timezone.utc) - span).isoformat()
+    tier = source_tier(width)
+    if not covers(tier, span, TIER_RETENTION):
+        # El nivel ya borró el principio del rango: mejor un error que una serie recortada
+        raise HTTPException(
+            status_code=400,
+            detail=f"Resolution {resolution} is only kept for {TIER_RETENTION[tier].days} days, use a coarser resolution",
+        )
+    label = resolution if resolution not in (None, "auto") else next(
+        (name for name, w in TIERS.items() if w == width), f"{int(width.total_seconds() // 60)}m"
+    )
+    if tier == "raw":
+        rows = await supabase_get_all("price_history", {
+            "select": "id,ticker,price,timestamp",
+            "ticker": f"eq.{ticker}",
+            "timestamp": f"gte.{since}",
+        })
+        bars = rollup_ticks(rows, label, width)
+    else:
+        rows = await supabase_get_all("price_rollups", {
+            "select": "id,ticker,bucket_start,open,high,low,close,samples",
+            "ticker": f"eq.{ticker}",
+            "resolution": f"eq.{tier}",
+            "bucket_start": f"gte.{since}",
+        })
+        bars = rollup_bars(rows, label, width)
+    
+    return {
+        "ticker": ticker,
+        "range": range_ or "1mo",
+        "resolution": label,
+        "source": tier,
+        "bars": bars,
+    }
 
 @api_router.get("/prices/{ticker}/current")
 async def get_current_price_endpoint(ticker: str):
@@ -721,57 +1939,28 @@ async def get_current_price_endpoint(ticker: str):
 @api_router.get("/prices/{ticker}/history")
 async def get_price_history_from_yahoo(ticker: str, market: str = "NYSE", asset_type: str = "CEDEAR", period: str = "1mo"):
     """Obtiene el historial de precios de Yahoo Finance"""
-    yahoo_ticker = get_yahoo_ticker(ticker, market, asset_type)
+    yahoo_ticker = symbol_candidates(ticker, market, asset_type)[0]
     
     try:
-        url = f'https://query1.finance.yahoo.com/v8/finance/chart/{yahoo_ticker}'
-        
-        # Mapear período a intervalo apropiado
-        interval_map = {
-            "1d": "5m",
-            "5d": "15m", 
-            "1mo": "1d",
-            "3mo": "1d",
-            "6mo": "1d",
-            "1y": "1wk",
-            "5y": "1mo"
-        }
-        interval = interval_map.get(period, "1d")
+        series = await asyncio.to_thread(get_chart_series, yahoo_ticker, period)
         
-        params = {'interval': interval, 'range': period}
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-        
-        response = requests.get(url, params=params, headers=headers, timeout=10)
-        
-        if response.status_code == 200:
-            data = response.json()
-            if 'chart' in data and 'result' in data['chart'] and data['chart']['result']:
-                result = data['chart']['result'][0]
-                timestamps = result.get('timestamp', [])
-                quotes = result.get('indicators', {}).get('quote', [{}])[0]
-                closes = quotes.get('close', [])
-                
-                # Construir array de datos para el gráfico
-                history = []
-                for i, ts in enumerate(timestamps):
-                    if closes[i] is not None:
-                        history.append({
-                            "date": datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M'),
-                            "price": round(closes[i], 2)
-                        })
-                
-                # Obtener precio actual
-                current_price = None
-                if 'meta' in result and 'regularMarketPrice' in result['meta']:
-                    current_price = result['meta']['regularMarketPrice']
-                
-                return {
-                    "ticker": ticker,
-                    "yahoo_ticker": yahoo_ticker,
-                    "current_price": current_price,
-                    "period": period,
-                    "history": history
+        if series:
+            # Construir array de datos para el gráfico
+            history = [
+                {
+                    "date": datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M'),
+                    "price": round(close, 2)
                 }
+                for ts, close in series["points"]
+            ]
+            
+            return {
+                "ticker": ticker,
+                "yahoo_ticker": yahoo_ticker,
+                "current_price": series["current_price"],
+                "period": period,
+                "history": history
+            }
         
         raise HTTPException(status_code=404, detail="Price history not available")
     except Exception as e:
@@ -792,6 +1981,58 @@ async def test_price_endpoint(ticker: str, market: str = "BCBA", asset_type: str
         "timestamp": datetime.now(timezone.utc).isoformat()
     }
 
+@api_router.get("/stats/price-cache")
+async def price_cache_stats():
+    """Contadores de la caché de precios (hits, misses, coalesced) para dimensionarla"""
+    return price_cache.stats()
+
+@api_router.get("/stats/price-history-buffer")
+async def price_history_buffer_stats():
+    """Contadores del buffer de escritura de price_history (pendientes, escritas, descartadas)"""
+    return price_history_buffer.stats()
+
+@api_router.get("/stats/chart-cache")
+async def chart_cache_stats():
+    """Tamaño de la caché en disco de series de Yahoo"""
+    return await asyncio.to_thread(chart_cache.stats)
+
+@api_router.get("/stats/portfolio-stream")
+async def portfolio_stream_stats():
+    """Conexiones abiertas y precios publicados en el stream del portafolio"""
+    return portfolio_broker.stats()
+
+@api_router.get("/stats/password-hasher")
+async def password_hasher_stats():
+    """Latencia de hash/verificación de contraseñas (incluye la espera en el executor)"""
+    return password_hasher.stats()
+
+@api_router.get("/stats/auth-cache")
+async def auth_cache_stats():
+    """Contadores de las cachés de tokens verificados y de perfiles de usuario"""
+    return {"tokens": token_cache.stats(), "user_profiles": user_profile_cache.stats()}
+
+@api_router.get("/stats/symbol-cache")
+async def symbol_cache_stats():
+    """Símbolos de Yahoo resueltos en disco y cuántas búsquedas los encontraron vigentes"""
+    return symbol_cache.stats()
+
+@api_router.get("/stats/yahoo")
+async def yahoo_client_stats():
+    """Pedidos, reintentos, estado del circuit breaker y símbolos sin datos del cliente de Yahoo"""
+    return yahoo_client.stats()
+
+@api_router.get("/stats/scheduler-leader")
+async def scheduler_leader_status():
+    """Si este proceso es el que corre los jobs del scheduler"""
+    if leader_election is None:
+        return {"elector": None, "is_leader": True, "since": None}
+    return leader_election.status()
+
+@api_router.get("/stats/market-hours")
+async def market_hours_status():
+    """Estado de cada mercado para el scheduler (abierto, intervalo, última consulta)"""
+    return polling_policy.status(datetime.now(timezone.utc))
+
 # Test endpoint para verificar alertas manualmente
 @api_router.post("/alerts/check-now")
 async def check_alerts_now(user_id: str = Depends(get_current_user)):
@@ -800,55 +2041,62 @@ async def check_alerts_now(user_id: str = Depends(get_current_user)):
     return {"message": "Verificación de alertas completada", "timestamp": datetime.now(timezone.utc).isoformat()}
 
 # Notifications routes
-@api_router.get("/notifications")
-async def get_notifications(user_id: str = Depends(get_current_user)):
-    """Obtiene todas las notificaciones del usuario ordenadas por fecha"""
-    result = supabase_get("notifications", {"user_id": f"eq.{user_id}", "order": "created_at.desc", "limit": "50"})
-    notifications = []
-    for n in result:
-        notifications.append(Notification(
-            notification_id=n['id'],
-            user_id=n['user_id'],
-            title=n['title'],
-            message=n['message'],
-            notification_type=n['notification_type'],
-            ticker=n.get('ticker'),
-            current_price=n.get('current_price'),
-            is_read=n.get('is_read', False),
-            created_at=n.get('created_at', '')
-        ))
-    return notifications
+@api_router.get("/notifications", response_model=List[Notification])
+async def get_notifications(cursor: Optional[str] = None, limit: int = Query(50, ge=1, le=API_PAGE_MAX_LIMIT),
+                            user_id: str = Depends(get_current_user)):
+    """Notificaciones del usuario de la más reciente a la más vieja, paginadas por cursor (X-Next-Cursor)"""
+    result, next_cursor = await supabase_page(
+        "notifications", {"user_id": f"eq.{user_id}"}, ("created_at", "id"), True, limit, cursor
+    )
+    return with_next_cursor(notifications_json.response(result), next_cursor)
+
+async def count_unread_notifications(user_id: str) -> int:
+    """Cantidad de notificaciones no leídas (contador en memoria o conteo en PostgREST)"""
+    count = await unread_counts.get_or_load(user_id, lambda: supabase_count(
+        "notifications",
+        {"user_id": f"eq.{user_id}", "is_read": "eq.false"},
+        method=NOTIFICATION_COUNT_METHOD,
+    ))
+    return count or 0
 
 @api_router.get("/notifications/unread-count")
 async def get_unread_count(user_id: str = Depends(get_current_user)):
     """Obtiene la cantidad de notificaciones no leídas"""
-    result = supabase_get("notifications", {"user_id": f"eq.{user_id}", "is_read": "eq.false"})
-    return {"count": len(result)}
+    return {"count": await count_unread_notifications(user_id)}
 
 @api_router.put("/notifications/{notification_id}/read")
 async def mark_notification_read(notification_id: str, user_id: str = Depends(get_current_user)):
     """Marca una notificación como leída"""
-    result = supabase_get("notifications", {"id": f"eq.{notification_id}", "user_id": f"eq.{user_id}"})
-    if not result:
-        raise HTTPException(status_code=404, detail="Notification not found")
+    # Solo se actualiza si no estaba leída: una fila devuelta es una no leída menos
+    match = {"id": notification_id, "user_id": user_id}
+    if await supabase_update("notifications", {**match, "is_read": False}, {"is_read": True}, select="id"):
+        adjust_unread_count(user_id, -1)
+        return {"message": "Notification marked as read"}
     
-    supabase_patch("notifications", {"id": notification_id}, {"is_read": True})
+    # Sin filas: ya estaba leída o no existe (camino poco frecuente, una consulta más)
+    if not await supabase_get("notifications", {"id": f"eq.{notification_id}", "user_id": f"eq.{user_id}", "select": "id"}):
+        raise HTTPException(status_code=404, detail="Notification not found")
     return {"message": "Notification marked as read"}
 
 @api_router.put("/notifications/read-all")
 async def mark_all_notifications_read(user_id: str = Depends(get_current_user)):
     """Marca todas las notificaciones del usuario como leídas"""
-    supabase_patch("notifications", {"user_id": user_id, "is_read": False}, {"is_read": True})
+    if not await supabase_patch("notifications", {"user_id": user_id, "is_read": False}, {"is_read": True}):
+        # No se sabe cuántas quedaron sin leer: el próximo pedido vuelve a contarlas
+        unread_counts.invalidate(user_id)
+        raise HTTPException(status_code=500, detail="Could not mark notifications as read")
+    unread_counts.set(user_id, 0)
     return {"message": "All notifications marked as read"}
 
 @api_router.delete("/notifications/{notification_id}")
 async def delete_notification(notification_id: str, user_id: str = Depends(get_current_user)):
     """Elimina una notificación"""
-    result = supabase_get("notifications", {"id": f"eq.{notification_id}", "user_id": f"eq.{user_id}"})
+    result = await supabase_remove("notifications", {"id": notification_id, "user_id": user_id}, select="id,is_read")
     if not result:
         raise HTTPException(status_code=404, detail="Notification not found")
     
-    supabase_delete("notifications", {"id": notification_id})
+    if not result[0].get('is_read'):
+        adjust_unread_count(user_id, -1)
     return {"message": "Notification deleted"}
 
 @api_router.post("/notifications/test")
@@ -871,6 +2119,7 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 logging.basicConfig(
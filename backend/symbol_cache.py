@@ -0,0 +1,112 @@
+"""
+InvestTracker - Resolución persistida de símbolos de Yahoo
+==========================================================
+
+Un activo (ticker, mercado, tipo) puede cotizar en Yahoo con sufijo (.BA) o sin él
+(ADRs, CEDEARs). En vez de probar las variantes en cada consulta, SymbolCache recuerda
+en disco (SQLite) cuál resolvió, así cada posición cuesta una sola llamada.
+
+Las entradas se revalidan cada revalidate_after segundos: pasado ese tiempo se vuelven
+a probar las variantes en el orden por defecto y se guarda la que responda.
+
+Uso:
+    symbols = SymbolCache(Path("symbol_cache.sqlite3"))
+    symbol = symbols.get(("YPF", "BCBA", "Acción"))
+    symbols.record(("YPF", "BCBA", "Acción"), "YPF")
+"""
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+
+Key = Tuple[str, str, str]
+
+
+class SymbolCache:
+    """(ticker, mercado, tipo) -> símbolo de Yahoo que resolvió, en memoria y en SQLite"""
+
+    def __init__(self, path: Path, revalidate_after: float = 7 * 86400):
+        self.path = path
+        self.revalidate_after = revalidate_after
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS symbols (
+                ticker TEXT NOT NULL,
+                market TEXT NOT NULL,
+                asset_type TEXT NOT NULL,
+                yahoo_symbol TEXT NOT NULL,
+                validated_at REAL NOT NULL,
+                PRIMARY KEY (ticker, market, asset_type)
+            )
+            """
+        )
+        self._conn.commit()
+        self._entries: Dict[Key, Tuple[str, float]] = {
+            (ticker, market, asset_type): (symbol, validated_at)
+            for ticker, market, asset_type, symbol, validated_at in self._conn.execute(
+                "SELECT ticker, market, asset_type, yahoo_symbol, validated_at FROM symbols"
+            )
+        }
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+
+    @staticmethod
+    def _key(key: Key) -> Key:
+        ticker, market, asset_type = key
+        return (ticker.upper(), (market or "").upper(), asset_type or "")
+
+    def get(self, key: Key) -> Optional[str]:
+        """Símbolo resuelto vigente, o None si no se conoce o toca revalidarlo"""
+        entry = self._entries.get(self._key(key))
+        if entry is None:
+            self.misses += 1
+            return None
+        if time.time() - entry[1] >= self.revalidate_after:
+            self.revalidations += 1
+            return None
+        self.hits += 1
+        return entry[0]
+
+    def record(self, key: Key, symbol: str):
+        """Guarda el símbolo que resolvió (solo escribe si cambió o estaba por revalidar)"""
+        key = self._key(key)
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == symbol and now - entry[1] < self.revalidate_after:
+            return
+        with self._lock:
+            self._entries[key] = (symbol, now)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO symbols (ticker, market, asset_type, yahoo_symbol, validated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (*key, symbol, now),
+            )
+            self._conn.commit()
+
+    def forget(self, key: Key):
+        key = self._key(key)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._conn.execute(
+                "DELETE FROM symbols WHERE ticker = ? AND market = ? AND asset_type = ?", key
+            )
+            self._conn.commit()
+
+    def stats(self) -> Dict:
+        return {
+            "entries": len(self._entries),
+            "revalidate_after": self.revalidate_after,
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidations": self.revalidations,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,133 @@
+"""
+InvestTracker - Buffer de escritura diferida (write-behind)
+===========================================================
+
+Acumula filas en memoria y las escribe en lote con una función async de flush
+(p.ej. un insert multi-fila a Supabase), para que el llamador no espere a la base
+de datos. Se vacía al llegar a batch_size filas, cada flush_interval segundos y al
+cerrarse.
+
+La memoria está acotada por max_rows. Cuando el buffer está lleno se aplica la
+política de desborde:
+    - "drop_oldest": descarta la fila más vieja para hacer lugar a la nueva
+    - "drop_newest": descarta la fila nueva
+
+Uso:
+    buffer = WriteBehindBuffer(lambda rows: supabase_insert_many("price_history", rows))
+    buffer.start()
+    buffer.add({...})
+    await buffer.close()
+"""
+
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest")
+
+
+class WriteBehindBuffer:
+    """Cola acotada de filas que se escriben en lote en segundo plano"""
+
+    def __init__(self, flush: Callable[[List[Dict]], Awaitable[bool]], name: str = "write_buffer",
+                 batch_size: int = 500, flush_interval: float = 5.0, max_rows: int = 10000,
+                 overflow_policy: str = "drop_oldest"):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow_policy must be one of {OVERFLOW_POLICIES}")
+        self._flush = flush
+        self.name = name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_rows = max_rows
+        self.overflow_policy = overflow_policy
+        self._rows: deque = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._closing = False
+        self.enqueued = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.failed_flushes = 0
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def start(self):
+        """Arranca la tarea de flush periódico (requiere un event loop corriendo)"""
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._lock = asyncio.Lock()
+            self._closing = False
+            self._task = asyncio.create_task(self._run())
+
+    def add(self, row: Dict):
+        """Encola una fila sin bloquear; aplica la política de desborde si está lleno"""
+        if len(self._rows) >= self.max_rows:
+            self.dropped += 1
+            if self.overflow_policy == "drop_newest":
+                return
+            self._rows.popleft()
+        self._rows.append(row)
+        self.enqueued += 1
+        if len(self._rows) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Escribe todas las filas pendientes en lotes de batch_size"""
+        lock = self._lock or asyncio.Lock()
+        async with lock:
+            while self._rows:
+                batch = [self._rows.popleft() for _ in range(min(self.batch_size, len(self._rows)))]
+                try:
+                    ok = await self._flush(batch)
+                except Exception as e:
+                    logging.error(f"{self.name}: flush of {len(batch)} rows raised: {e}")
+                    ok = False
+                if ok:
+                    self.flushed += len(batch)
+                    continue
+                # Devolver el lote al frente para reintentarlo en el próximo ciclo,
+                # sin superar max_rows (se descartan las más viejas)
+                self.failed_flushes += 1
+                room = self.max_rows - len(self._rows)
+                if room < len(batch):
+                    self.dropped += len(batch) - max(room, 0)
+                    batch = batch[len(batch) - max(room, 0):]
+                self._rows.extendleft(reversed(batch))
+                logging.warning(f"{self.name}: flush failed, {len(self._rows)} rows pending")
+                return
+
+    async def close(self):
+        """Detiene el flush periódico y escribe lo pendiente (se llama al apagar la app)"""
+        if self._task is not None:
+            # No se cancela la tarea para no perder un lote a mitad de escritura
+            self._closing = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+        if self._rows:
+            logging.error(f"{self.name}: {len(self._rows)} rows could not be written on shutdown")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._rows),
+            "max_rows": self.max_rows,
+            "overflow_policy": self.overflow_policy,
+            "enqueued": self.enqueued,
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "failed_flushes": self.failed_flushes,
+        }
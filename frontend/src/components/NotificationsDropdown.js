@@ -8,7 +8,7 @@ import { toast } from 'sonner';
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
-const NotificationsDropdown = ({ token }) => {
+const NotificationsDropdown = ({ token, notificationState }) => {
   const [isOpen, setIsOpen] = useState(false);
   const [notifications, setNotifications] = useState([]);
   const [unreadCount, setUnreadCount] = useState(0);
@@ -32,9 +32,16 @@ const NotificationsDropdown = ({ token }) => {
     }
   };
 
-  // Fetch notifications on mount and every 30 seconds
+  // The dashboard response already carries the first page and the unread count
+  useEffect(() => {
+    if (notificationState) {
+      setNotifications(notificationState.notifications);
+      setUnreadCount(notificationState.unreadCount);
+    }
+  }, [notificationState]);
+
+  // Refresh every 30 seconds (the initial state comes from the dashboard)
   useEffect(() => {
-    fetchNotifications();
     const interval = setInterval(fetchNotifications, 30000);
     return () => clearInterval(interval);
     // eslint-disable-next-line react-hooks/exhaustive-deps
@@ -27,6 +27,7 @@ const Dashboard = ({ user, onLogout }) => {
   const [assets, setAssets] = useState([]);
   const [alerts, setAlerts] = useState([]);
   const [alertHistory, setAlertHistory] = useState([]);
+  const [notificationState, setNotificationState] = useState(null);
   const [isLoading, setIsLoading] = useState(true);
   const [showAssetModal, setShowAssetModal] = useState(false);
   const [showAlertModal, setShowAlertModal] = useState(false);
@@ -41,15 +42,18 @@ const Dashboard = ({ user, onLogout }) => {
   const fetchData = async () => {
     setIsLoading(true);
     try {
-      const [summaryRes, assetsRes, alertsRes, historyRes] = await Promise.all([
-        axios.get(`${API}/portfolio/summary`, axiosConfig),
-        axios.get(`${API}/portfolio/assets`, axiosConfig),
+      const [{ data }, alertsRes, historyRes] = await Promise.all([
+        axios.get(`${API}/dashboard`, axiosConfig),
         axios.get(`${API}/alerts`, axiosConfig),
         axios.get(`${API}/alerts/history`, axiosConfig)
       ]);
 
-      setSummary(summaryRes.data);
-      setAssets(assetsRes.data);
+      setSummary(data.summary);
+      setAssets(data.assets);
+      setNotificationState({
+        notifications: data.notifications,
+        unreadCount: data.unread_count
+      });
       setAlerts(alertsRes.data);
       setAlertHistory(historyRes.data);
     } catch (error) {
@@ -204,7 +208,7 @@ const Dashboard = ({ user, onLogout }) => {
 
             <div className="flex items-center gap-3">
               {/* Notifications Bell */}
-              <NotificationsDropdown token={token} />
+              <NotificationsDropdown token={token} notificationState={notificationState} />
 
               {activeTab === 'assets' && (
                 <Button onClick={handleAddAsset} data-testid="add-asset-button">
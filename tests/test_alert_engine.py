@@ -0,0 +1,121 @@
+import pytest
+
+from alert_engine import AlertIndex, alert_threshold
+
+YPF = ("YPF", "BCBA", "Acción")
+GGAL = ("GGAL", "BCBA", "Acción")
+
+
+def alert(alert_id, alert_type, target_value, asset_id="asset-1", is_percentage=False, avg=100.0):
+    return {
+        "id": alert_id, "asset_id": asset_id, "user_id": "user-1", "alert_type": alert_type,
+        "target_value": target_value, "is_percentage": is_percentage,
+        "assets": {"avg_purchase_price": avg},
+    }
+
+
+def fired(index, ticker_key, price):
+    return sorted(a["id"] for a in index.triggered(ticker_key, price))
+
+
+@pytest.fixture
+def index():
+    index = AlertIndex()
+    index.add_many([
+        (YPF, alert("buy-90", "target_buy", 90)),
+        (YPF, alert("stop-80", "stop_loss", 80)),
+        (YPF, alert("sell-110", "target_sell", 110)),
+        (YPF, alert("profit-120", "take_profit", 120)),
+    ])
+    return index
+
+
+def test_price_between_thresholds_fires_nothing(index):
+    assert fired(index, YPF, 100) == []
+
+
+def test_below_side_fires_at_equal_price(index):
+    assert fired(index, YPF, 90) == ["buy-90"]
+
+
+def test_below_side_fires_every_threshold_at_or_above_price(index):
+    assert fired(index, YPF, 79.99) == ["buy-90", "stop-80"]
+
+
+def test_above_side_fires_at_equal_price(index):
+    assert fired(index, YPF, 110) == ["sell-110"]
+
+
+def test_above_side_fires_every_threshold_at_or_below_price(index):
+    assert fired(index, YPF, 150) == ["profit-120", "sell-110"]
+
+
+def test_unknown_ticker_fires_nothing(index):
+    assert fired(index, GGAL, 1) == []
+
+
+def test_percentage_threshold_uses_avg_purchase_price():
+    a = alert("pct", "stop_loss", -10, is_percentage=True, avg=200)
+    assert alert_threshold(a, 200) == pytest.approx(180)
+    index = AlertIndex()
+    index.add(YPF, a)
+    assert fired(index, YPF, 180.01) == []
+    assert fired(index, YPF, 180) == ["pct"]
+
+
+def test_add_replaces_existing_alert(index):
+    index.add(YPF, alert("buy-90", "target_buy", 95))
+    assert len(index) == 4
+    assert fired(index, YPF, 93) == ["buy-90"]
+
+
+def test_add_many_matches_add_one_by_one():
+    alerts = [(YPF if i % 2 else GGAL, alert(f"a{i}", "target_buy", i % 7, asset_id=f"s{i % 3}")) for i in range(30)]
+    bulk, single = AlertIndex(), AlertIndex()
+    bulk.add_many(alerts)
+    for ticker_key, a in alerts:
+        single.add(ticker_key, a)
+    for ticker_key in (YPF, GGAL):
+        for price in range(-1, 8):
+            assert fired(bulk, ticker_key, price) == fired(single, ticker_key, price)
+
+
+def test_remove(index):
+    assert index.remove("buy-90")["id"] == "buy-90"
+    assert index.remove("buy-90") is None
+    assert "buy-90" not in index
+    assert fired(index, YPF, 85) == []
+
+
+def test_remove_many_keeps_the_rest(index):
+    removed = index.remove_many(["buy-90", "sell-110", "missing"])
+    assert sorted(a["id"] for a in removed) == ["buy-90", "sell-110"]
+    assert len(index) == 2
+    assert fired(index, YPF, 0) == ["stop-80"]
+    assert fired(index, YPF, 1000) == ["profit-120"]
+
+
+def test_removing_every_alert_drops_the_ticker(index):
+    index.remove_many(["buy-90", "stop-80", "sell-110", "profit-120"])
+    assert len(index) == 0
+    assert index.triggered(YPF, 100) == []
+    assert not index._by_ticker
+
+
+def test_remove_asset():
+    index = AlertIndex()
+    index.add_many([
+        (YPF, alert("a", "target_buy", 90, asset_id="asset-1")),
+        (YPF, alert("b", "target_buy", 95, asset_id="asset-2")),
+    ])
+    index.remove_asset("asset-1")
+    assert fired(index, YPF, 0) == ["b"]
+
+
+def test_reprice_asset_moves_ticker_and_thresholds():
+    index = AlertIndex()
+    index.add(YPF, alert("pct", "take_profit", 10, is_percentage=True, avg=100))
+    index.reprice_asset("asset-1", GGAL, 200)
+    assert fired(index, YPF, 1000) == []
+    assert fired(index, GGAL, 219.9) == []
+    assert fired(index, GGAL, 221) == ["pct"]
@@ -0,0 +1,101 @@
+import asyncio
+
+from cache import TTLCache
+
+
+def test_get_or_load_coalesces_concurrent_misses():
+    async def scenario():
+        cache = TTLCache(maxsize=10, ttl=60)
+        calls = []
+        release = asyncio.Event()
+
+        async def loader():
+            calls.append(1)
+            await release.wait()
+            return 42
+
+        waiters = [asyncio.ensure_future(cache.get_or_load("AAPL", loader)) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*waiters)
+        return cache, calls, results
+
+    cache, calls, results = asyncio.run(scenario())
+    assert results == [42] * 5
+    assert len(calls) == 1
+    assert (cache.misses, cache.coalesced) == (1, 4)
+    assert cache.peek("AAPL") == 42
+    assert cache.stats()["inflight"] == 0
+
+
+def test_cancelled_waiter_does_not_cancel_shared_load():
+    async def scenario():
+        cache = TTLCache(maxsize=10, ttl=60)
+        release = asyncio.Event()
+
+        async def loader():
+            await release.wait()
+            return "price"
+
+        first = asyncio.ensure_future(cache.get_or_load("YPF", loader))
+        second = asyncio.ensure_future(cache.get_or_load("YPF", loader))
+        await asyncio.sleep(0)
+        # El primero se va por deadline; la carga compartida debe seguir para el resto
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        return cache, first, await second
+
+    cache, first, value = asyncio.run(scenario())
+    assert first.cancelled()
+    assert value == "price"
+    assert cache.peek("YPF") == "price"
+
+
+def test_failed_load_is_not_cached_and_can_be_retried():
+    async def scenario():
+        cache = TTLCache(maxsize=10, ttl=60)
+
+        async def broken():
+            raise RuntimeError("yahoo down")
+
+        async def loader():
+            return 7
+
+        try:
+            await cache.get_or_load("GGAL", broken)
+        except RuntimeError:
+            pass
+        assert "GGAL" not in cache
+        return await cache.get_or_load("GGAL", loader)
+
+    assert asyncio.run(scenario()) == 7
+
+
+def test_none_is_only_cached_when_enabled():
+    async def scenario(cache_none):
+        cache = TTLCache(maxsize=10, ttl=60, cache_none=cache_none)
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            return None
+
+        await cache.get_or_load("X", loader)
+        await cache.get_or_load("X", loader)
+        return len(calls)
+
+    assert asyncio.run(scenario(False)) == 2
+    assert asyncio.run(scenario(True)) == 1
+
+
+def test_lru_eviction_and_expiry():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert "b" not in cache and "a" in cache and "c" in cache
+    assert cache.evictions == 1
+    cache.set("d", 4, ttl=0)
+    assert "d" not in cache
@@ -0,0 +1,135 @@
+import time
+
+import pytest
+import requests
+
+from market_data import CircuitBreaker, YahooClient, YahooUnavailable
+
+
+class FakeResponse:
+    def __init__(self, status_code, payload=None, headers=None):
+        self.status_code = status_code
+        self._payload = payload
+        self.headers = headers or {}
+
+    def json(self):
+        if self._payload is None:
+            raise ValueError("no JSON")
+        return self._payload
+
+
+def client(*responses, **kwargs):
+    """YahooClient sin backoff cuyo session.get devuelve las respuestas en orden"""
+    c = YahooClient(rate=1000, burst=1000, backoff_base=0, backoff_max=0, **kwargs)
+    queue = list(responses)
+    calls = []
+
+    def get(url, params=None, timeout=None):
+        calls.append(url)
+        item = queue.pop(0)
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    c.session.get = get
+    c.calls = calls
+    return c
+
+
+NOT_FOUND = {"chart": {"result": None, "error": {"code": "Not Found", "description": "No data found"}}}
+CHART_OK = {"chart": {"result": [{"meta": {"symbol": "AAPL"}}], "error": None}}
+
+
+# Circuit breaker ---------------------------------------------------------------
+
+def test_breaker_opens_after_threshold_and_recovers_through_half_open():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    assert breaker.rejected == 1
+
+    time.sleep(0.06)
+    # Solo un pedido de prueba pasa mientras está half_open
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.failures == 0
+    assert breaker.allow()
+
+
+def test_failed_trial_reopens_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.05)
+    for _ in range(3):
+        breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_client_fails_fast_while_circuit_is_open():
+    c = client(FakeResponse(503), FakeResponse(503), max_retries=1, failure_threshold=1, reset_timeout=60)
+    with pytest.raises(YahooUnavailable):
+        c.chart("AAPL", {})
+    assert c.breaker.state == "open"
+    with pytest.raises(YahooUnavailable):
+        c.chart("AAPL", {})
+    assert len(c.calls) == 2
+
+
+def test_retries_then_succeeds():
+    c = client(requests.ConnectionError("reset"), FakeResponse(429), FakeResponse(200, CHART_OK), max_retries=3)
+    assert c.chart("AAPL", {}) == {"meta": {"symbol": "AAPL"}}
+    assert c.retries == 2
+    assert c.breaker.state == "closed"
+
+
+# Caché negativa ----------------------------------------------------------------
+
+def test_chart_not_found_marks_symbol_unknown():
+    c = client(FakeResponse(404, NOT_FOUND))
+    assert c.chart("NOPE", {}) is None
+    assert c.is_unknown("NOPE")
+    # No se vuelve a pedir mientras dure la caché negativa
+    assert c.chart("NOPE", {}) is None
+    assert len(c.calls) == 1
+
+
+@pytest.mark.parametrize("response", [
+    FakeResponse(200, {"chart": {"result": [], "error": None}}),
+    FakeResponse(400, {"chart": {"result": None, "error": {"code": "Bad Request"}}}),
+    FakeResponse(403),
+    FakeResponse(200),
+])
+def test_chart_other_failures_do_not_mark_symbol(response):
+    c = client(response)
+    assert c.chart("AAPL", {}) is None
+    assert not c.is_unknown("AAPL")
+
+
+def test_exhausted_retries_do_not_mark_symbol():
+    c = client(FakeResponse(500), FakeResponse(500), max_retries=1)
+    with pytest.raises(YahooUnavailable):
+        c.chart("AAPL", {})
+    assert not c.is_unknown("AAPL")
+
+
+def test_spark_marks_only_items_reported_not_found():
+    payload = {"spark": {"result": [
+        {"symbol": "AAPL", "response": [{"meta": {"symbol": "AAPL"}}]},
+        {"symbol": "NOPE", "error": {"code": "Not Found"}},
+        {"symbol": "ODD", "response": []},
+    ]}}
+    c = client(FakeResponse(200, payload))
+    results = c.spark(["AAPL", "NOPE", "ODD", "MISSING"], {})
+    assert results["AAPL"] == {"meta": {"symbol": "AAPL"}}
+    assert results["NOPE"] is None and results["MISSING"] is None
+    assert c.is_unknown("NOPE")
+    assert not any(c.is_unknown(s) for s in ("AAPL", "ODD", "MISSING"))
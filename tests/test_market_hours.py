@@ -0,0 +1,59 @@
+from datetime import date, datetime, time, timezone
+
+from market_hours import MarketSession, PollingPolicy, byma_holidays, easter, nth_weekday, nyse_holidays
+
+
+def test_easter():
+    assert easter(2024) == date(2024, 3, 31)
+    assert easter(2026) == date(2026, 4, 5)
+    assert easter(2027) == date(2027, 3, 28)
+
+
+def test_nth_weekday():
+    assert nth_weekday(2026, 1, 0, 3) == date(2026, 1, 19)
+    assert nth_weekday(2026, 5, 0, -1) == date(2026, 5, 25)
+    assert nth_weekday(2026, 12, 3, -1) == date(2026, 12, 31)
+
+
+def test_nyse_holidays_2026():
+    assert nyse_holidays(2026) == {
+        date(2026, 1, 1), date(2026, 1, 19), date(2026, 2, 16), date(2026, 4, 3),
+        date(2026, 5, 25), date(2026, 6, 19), date(2026, 7, 3), date(2026, 9, 7),
+        date(2026, 11, 26), date(2026, 12, 25),
+    }
+
+
+def test_nyse_weekend_observance():
+    holidays = nyse_holidays(2027)
+    assert date(2027, 6, 18) in holidays   # Juneteenth en sábado
+    assert date(2027, 7, 5) in holidays    # 4 de julio en domingo
+    assert date(2027, 12, 24) in holidays  # Navidad en sábado
+    # Año nuevo 2028 cae sábado: el 31/12/2027 se opera
+    assert date(2027, 12, 31) not in holidays
+
+
+def test_byma_holidays_2026():
+    holidays = byma_holidays(2026)
+    for day in (date(2026, 2, 16), date(2026, 2, 17), date(2026, 3, 24), date(2026, 4, 2),
+                date(2026, 4, 3), date(2026, 6, 15), date(2026, 8, 17), date(2026, 10, 12),
+                date(2026, 11, 23), date(2026, 12, 8)):
+        assert day in holidays, day
+    assert date(2026, 11, 20) not in holidays
+
+
+def test_session_uses_calendar_and_extra_holidays():
+    session = MarketSession("US", "America/New_York", time(9, 30), time(16, 0),
+                            holidays={date(2026, 1, 2)}, calendar=nyse_holidays)
+    assert not session.is_trading_day(date(2026, 11, 26))
+    assert not session.is_trading_day(date(2026, 1, 2))
+    assert session.is_trading_day(date(2026, 11, 27))
+
+
+def test_closing_poll_is_due_until_marked():
+    session = MarketSession("US", "America/New_York", time(9, 30), time(16, 0), calendar=nyse_holidays)
+    policy = PollingPolicy([session])
+    after_close = datetime(2026, 10, 16, 21, 0, tzinfo=timezone.utc)
+    assert policy.due_markets(after_close) == {"US"}
+    assert policy.due_markets(after_close) == {"US"}
+    policy.mark_polled({"US"}, after_close)
+    assert policy.due_markets(after_close) == set()
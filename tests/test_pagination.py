@@ -0,0 +1,79 @@
+import base64
+
+import pytest
+
+from pagination import between, decode_cursor, encode_cursor, keyset_after, keyset_order, quote_value
+
+
+def test_keyset_after_single_column_ascending():
+    assert keyset_after(["id"], ["abc"]) == '(id.gt."abc")'
+
+
+def test_keyset_after_single_column_descending():
+    assert keyset_after(["id"], ["abc"], descending=True) == '(id.lt."abc")'
+
+
+def test_keyset_after_breaks_ties_on_later_columns():
+    assert keyset_after(["user_id", "id"], ["u1", "a1"]) == (
+        '(user_id.gt."u1",and(user_id.eq."u1",id.gt."a1"))'
+    )
+
+
+def test_keyset_after_three_columns_descending():
+    assert keyset_after(["sent_at", "ticker", "id"], ["2024-01-01", "YPF", 7], descending=True) == (
+        '(sent_at.lt."2024-01-01",'
+        'and(sent_at.eq."2024-01-01",ticker.lt."YPF"),'
+        'and(sent_at.eq."2024-01-01",ticker.eq."YPF",id.lt."7"))'
+    )
+
+
+def test_keyset_after_quotes_reserved_characters():
+    # Timestamps con puntos y ':' y valores con comas o paréntesis no rompen el filtro
+    assert keyset_after(["created_at"], ["2024-01-15T12:00:00.123+00:00"]) == (
+        '(created_at.gt."2024-01-15T12:00:00.123+00:00")'
+    )
+    assert keyset_after(["title"], ["a,b(c)"]) == '(title.gt."a,b(c)")'
+
+
+def test_quote_escapes_quotes_and_backslashes():
+    assert quote_value('say "hi"') == '"say \\"hi\\""'
+    assert quote_value("a\\b") == '"a\\\\b"'
+
+
+def test_keyset_order():
+    assert keyset_order(["user_id", "id"]) == "user_id,id"
+    assert keyset_order(["sent_at", "id"], descending=True) == "sent_at.desc,id.desc"
+
+
+@pytest.mark.parametrize("values", [
+    ["2024-01-15T12:00:00+00:00", "6f1c8a0e-1d2b-4c3d-9e8f-0a1b2c3d4e5f"],
+    [1700000000, "x"],
+    [1.5, "ñandú \"quoted\""],
+])
+def test_cursor_round_trip(values):
+    cursor = encode_cursor(values)
+    assert "=" not in cursor
+    assert decode_cursor(cursor, len(values)) == values
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64 !!",
+    base64.urlsafe_b64encode(b"not json").decode(),
+    base64.urlsafe_b64encode(b'{"a": 1}').decode(),
+    base64.urlsafe_b64encode(b'[null, "x"]').decode(),
+    base64.urlsafe_b64encode(b'[["nested"], "x"]').decode(),
+])
+def test_decode_cursor_rejects_garbage(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, 2)
+
+
+def test_decode_cursor_rejects_wrong_size():
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor(["a", "b"]), 3)
+
+
+def test_between_quotes_both_bounds():
+    assert between("timestamp", "2024-01-01T00:00:00+00:00", "2024-01-02T00:00:00+00:00") == (
+        '(timestamp.gte."2024-01-01T00:00:00+00:00",timestamp.lt."2024-01-02T00:00:00+00:00")'
+    )
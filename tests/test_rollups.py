@@ -0,0 +1,69 @@
+import random
+from datetime import timedelta
+
+from rollups import BarAggregator, auto_resolution, covers, rollup_bars, rollup_ticks
+
+
+def tick(ticker, timestamp, price):
+    return {"ticker": ticker, "timestamp": timestamp, "price": price}
+
+
+def test_ticks_roll_up_into_ohlc():
+    bars = rollup_ticks([
+        tick("YPF", "2024-01-15T10:05:00+00:00", 10),
+        tick("YPF", "2024-01-15T10:20:00+00:00", 14),
+        tick("YPF", "2024-01-15T10:40:00+00:00", 8),
+        tick("YPF", "2024-01-15T10:55:00Z", 11),
+        tick("YPF", "2024-01-15T11:00:00+00:00", 12),
+    ], "1h")
+    assert [(b["bucket_start"], b["open"], b["high"], b["low"], b["close"], b["samples"]) for b in bars] == [
+        ("2024-01-15T10:00:00+00:00", 10, 14, 8, 11, 4),
+        ("2024-01-15T11:00:00+00:00", 12, 12, 12, 12, 1),
+    ]
+
+
+def test_aggregator_does_not_depend_on_row_order():
+    rows = [tick(t, f"2024-01-{d:02d}T{h:02d}:{m:02d}:00+00:00", float(i))
+            for i, (t, d, h, m) in enumerate((t, d, h, m) for t in "AB" for d in (1, 2) for h in (3, 9) for m in (0, 30))]
+    shuffled = rows[:]
+    random.Random(0).shuffle(shuffled)
+    assert rollup_ticks(shuffled, "1h") == rollup_ticks(rows, "1h")
+
+
+def test_bars_roll_up_into_coarser_bars():
+    hourly = rollup_ticks([
+        tick("YPF", "2024-01-15T10:00:00+00:00", 10),
+        tick("YPF", "2024-01-15T23:59:00+00:00", 9),
+        tick("YPF", "2024-01-15T15:00:00+00:00", 20),
+    ], "1h")
+    [daily] = rollup_bars(hourly, "1d")
+    assert (daily["bucket_start"], daily["open"], daily["high"], daily["low"], daily["close"], daily["samples"]) == (
+        "2024-01-15T00:00:00+00:00", 10, 20, 9, 9, 3,
+    )
+
+
+def test_weeks_start_on_monday():
+    aggregator = BarAggregator("1w")
+    aggregator.add_bar({"ticker": "YPF", "bucket_start": "2024-01-17T00:00:00+00:00",
+                        "open": 1, "high": 1, "low": 1, "close": 1, "samples": 2})
+    assert len(aggregator) == 1
+    assert aggregator.bars()[0]["bucket_start"] == "2024-01-15T00:00:00+00:00"
+
+
+RETENTION = {"raw": timedelta(days=7), "1h": timedelta(days=90), "1d": timedelta(days=1825), "1w": None}
+
+
+def test_covers_respects_retention():
+    assert covers("raw", timedelta(days=7), RETENTION)
+    assert not covers("raw", timedelta(days=10), RETENTION)
+    assert not covers("1h", timedelta(days=120), RETENTION)
+    assert covers("1w", timedelta(days=3650), RETENTION)
+    assert covers("raw", timedelta(days=10), None)
+
+
+def test_auto_resolution_skips_tiers_that_lost_part_of_the_range():
+    raw = timedelta(minutes=15)
+    # 10 días de ticks entran en 1000 puntos pero el crudo solo guarda 7
+    assert auto_resolution(timedelta(days=10), 1000, raw) == raw
+    assert auto_resolution(timedelta(days=10), 1000, raw, RETENTION) == timedelta(hours=1)
+    assert auto_resolution(timedelta(days=120), 5000, raw, RETENTION) == timedelta(days=1)
@@ -0,0 +1,133 @@
+import asyncio
+
+import pytest
+
+from write_buffer import WriteBehindBuffer
+
+
+class Sink:
+    """flush falso: guarda los lotes y falla mientras fail sea True"""
+
+    def __init__(self, fail=False, raises=False):
+        self.fail = fail
+        self.raises = raises
+        self.batches = []
+
+    async def __call__(self, rows):
+        if self.raises:
+            raise RuntimeError("supabase down")
+        if self.fail:
+            return False
+        self.batches.append([r["n"] for r in rows])
+        return True
+
+
+def rows(buffer):
+    return [r["n"] for r in buffer._rows]
+
+
+def test_rejects_unknown_overflow_policy():
+    with pytest.raises(ValueError):
+        WriteBehindBuffer(Sink(), overflow_policy="block")
+
+
+def test_drop_oldest_keeps_the_newest_rows():
+    buffer = WriteBehindBuffer(Sink(), max_rows=3, overflow_policy="drop_oldest")
+    for n in range(5):
+        buffer.add({"n": n})
+    assert rows(buffer) == [2, 3, 4]
+    assert (buffer.enqueued, buffer.dropped) == (5, 2)
+
+
+def test_drop_newest_keeps_the_oldest_rows():
+    buffer = WriteBehindBuffer(Sink(), max_rows=3, overflow_policy="drop_newest")
+    for n in range(5):
+        buffer.add({"n": n})
+    assert rows(buffer) == [0, 1, 2]
+    assert (buffer.enqueued, buffer.dropped) == (3, 2)
+
+
+def test_flush_writes_in_batches():
+    sink = Sink()
+    buffer = WriteBehindBuffer(sink, batch_size=2)
+    for n in range(5):
+        buffer.add({"n": n})
+    asyncio.run(buffer.flush())
+    assert sink.batches == [[0, 1], [2, 3], [4]]
+    assert len(buffer) == 0 and buffer.flushed == 5
+
+
+@pytest.mark.parametrize("sink", [Sink(fail=True), Sink(raises=True)])
+def test_failed_flush_requeues_batch_in_order(sink):
+    buffer = WriteBehindBuffer(sink, batch_size=2)
+    for n in range(3):
+        buffer.add({"n": n})
+    asyncio.run(buffer.flush())
+    assert rows(buffer) == [0, 1, 2]
+    assert buffer.failed_flushes == 1 and buffer.flushed == 0
+
+    sink.fail = sink.raises = False
+    asyncio.run(buffer.flush())
+    assert sink.batches == [[0, 1], [2]]
+    assert len(buffer) == 0
+
+
+def test_requeue_respects_max_rows():
+    sink = Sink(fail=True)
+    buffer = WriteBehindBuffer(sink, batch_size=3, max_rows=4)
+    for n in range(4):
+        buffer.add({"n": n})
+
+    async def scenario():
+        # Mientras el lote [0, 1, 2] está en vuelo llegan filas nuevas y llenan el buffer
+        original = buffer._flush
+
+        async def slow(batch):
+            for n in (4, 5, 6):
+                buffer.add({"n": n})
+            return await original(batch)
+
+        buffer._flush = slow
+        await buffer.flush()
+
+    asyncio.run(scenario())
+    # El buffer ya está lleno con filas más nuevas: el lote fallido se descarta entero
+    assert rows(buffer) == [3, 4, 5, 6]
+    assert buffer.dropped == 3
+
+
+def test_requeue_keeps_newest_rows_of_failed_batch_that_fit():
+    buffer = WriteBehindBuffer(Sink(fail=True), batch_size=3, max_rows=5)
+    for n in range(4):
+        buffer.add({"n": n})
+
+    async def scenario():
+        original = buffer._flush
+
+        async def slow(batch):
+            buffer.add({"n": 4})
+            buffer.add({"n": 5})
+            return await original(batch)
+
+        buffer._flush = slow
+        await buffer.flush()
+
+    asyncio.run(scenario())
+    assert rows(buffer) == [1, 2, 3, 4, 5]
+    assert buffer.dropped == 1
+
+
+def test_close_flushes_pending_rows():
+    sink = Sink()
+
+    async def scenario():
+        buffer = WriteBehindBuffer(sink, batch_size=100, flush_interval=60)
+        buffer.start()
+        buffer.add({"n": 1})
+        buffer.add({"n": 2})
+        await buffer.close()
+        return buffer
+
+    buffer = asyncio.run(scenario())
+    assert sink.batches == [[1, 2]]
+    assert len(buffer) == 0